@@ -0,0 +1,335 @@
+"""Running totals behind DreamVista.get_dream_statistics"""
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import date
+from itertools import combinations, compress, repeat
+from operator import add, eq
+
+from records import column, dream_day
+
+GRANULARITIES = ('day', 'week', 'month')
+SCORINGS = ('lift', 'pmi')
+# Pairs seen together in fewer dreams are left out of related-symbol lists
+MIN_PAIR_DREAMS = 2
+
+
+def period_start(day, granularity):
+    """First day of the day, ISO week or month containing `day` (day numbers)"""
+    if granularity == 'week':
+        return day - date.fromordinal(day).weekday()
+    if granularity == 'month':
+        return date.fromordinal(day).replace(day=1).toordinal()
+    return day
+
+
+def period_label(day, granularity):
+    """'2024-03-05', '2024-W10' or '2024-03' for the period starting on `day`"""
+    start = date.fromordinal(day)
+    if granularity == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    if granularity == 'month':
+        return start.strftime('%Y-%m')
+    return start.isoformat()
+
+
+class DailyRollups:
+    """Dream and symbol counts per dream_date.
+    
+    Statistics over a date range add up one bucket per day that has dreams
+    instead of rescanning the interpretations. Days are date.toordinal()
+    numbers kept in sorted order; dreams whose dream_date is not a
+    YYYY-MM-DD date are left out.
+    """
+    
+    def __init__(self):
+        self.days = []
+        self.dream_counts = {}
+        # day -> Counter of symbol_id
+        self.symbol_counts = {}
+    
+    @classmethod
+    def from_data(cls, data, symbols_by_id):
+        """Compute the rollups from scratch"""
+        rollups = cls()
+        day_of = {dream['id']: dream_day(dream) for dream in data['dreams']}
+        for day, count in Counter(day_of.values()).items():
+            if day is not None:
+                rollups._add_day(day)
+                rollups.dream_counts[day] = count
+        interpretations = data['interpretations']
+        pairs = Counter(zip(map(day_of.get, column(interpretations, 'dream_id')),
+                            column(interpretations, 'symbol_id')))
+        for (day, symbol_id), count in pairs.items():
+            if day is not None and symbol_id in symbols_by_id:
+                if day not in rollups.dream_counts:
+                    rollups._add_day(day)
+                rollups.symbol_counts[day][symbol_id] = count
+        return rollups
+    
+    def _add_day(self, day):
+        insort(self.days, day)
+        self.dream_counts[day] = 0
+        self.symbol_counts[day] = Counter()
+    
+    def add_dream(self, day, count=1):
+        if day is not None:
+            if day not in self.dream_counts:
+                self._add_day(day)
+            self.dream_counts[day] += count
+    
+    def add_interpretation(self, day, symbol_id, count=1):
+        if day is not None:
+            if day not in self.dream_counts:
+                self._add_day(day)
+            self.symbol_counts[day][symbol_id] += count
+    
+    def days_between(self, first=None, last=None):
+        """Days with data from `first` to `last` inclusive; None leaves a side open"""
+        start = 0 if first is None else bisect_left(self.days, first)
+        end = len(self.days) if last is None else bisect_right(self.days, last)
+        return self.days[start:end]
+    
+    def summarize(self, symbols_by_id, first=None, last=None, granularity=None, top_k=5):
+        """Statistics for a date range, in the shape of get_dream_statistics.
+        
+        With a granularity, 'trend' lists the dream count and tone counts
+        of every day, week or month in the range that has dreams.
+        """
+        total_dreams = 0
+        symbol_counts = Counter()
+        periods = {}
+        for day in self.days_between(first, last):
+            total_dreams += self.dream_counts[day]
+            symbol_counts.update(self.symbol_counts[day])
+            if granularity:
+                period = periods.setdefault(period_start(day, granularity), [0, Counter()])
+                period[0] += self.dream_counts[day]
+                for symbol_id, count in self.symbol_counts[day].items():
+                    if symbol_id in symbols_by_id:
+                        period[1][symbols_by_id[symbol_id]['emotional_tone']] += count
+        
+        tone_counts = Counter()
+        for symbol_id in list(symbol_counts):
+            if symbol_id in symbols_by_id:
+                tone_counts[symbols_by_id[symbol_id]['emotional_tone']] += symbol_counts[symbol_id]
+            else:
+                del symbol_counts[symbol_id]
+        stats = {
+            'total_dreams': total_dreams,
+            'common_symbols': [{'symbol': symbols_by_id[symbol_id]['symbol'], 'frequency': count}
+                               for symbol_id, count in heapq.nlargest(
+                                   top_k, symbol_counts.items(), key=lambda item: item[1])],
+            'emotional_tones': [{'emotional_tone': tone, 'count': count} for tone, count in tone_counts.items()]
+        }
+        if granularity:
+            stats['trend'] = [{'period': period_label(start, granularity), 'dreams': dreams,
+                               'emotional_tones': dict(tones)}
+                              for start, (dreams, tones) in periods.items()]
+        return stats
+    
+    def differences(self, other):
+        """List human-readable differences from another DailyRollups"""
+        problems = []
+        for day in sorted(set(self.days) | set(other.days)):
+            label = date.fromordinal(day).isoformat()
+            if self.dream_counts.get(day, 0) != other.dream_counts.get(day, 0):
+                problems.append(f"dreams on {label}: {self.dream_counts.get(day, 0)} "
+                                f"!= {other.dream_counts.get(day, 0)}")
+            if self.symbol_counts.get(day, Counter()) != other.symbol_counts.get(day, Counter()):
+                problems.append(f"symbol counts on {label} differ")
+        return problems
+
+
+class CoOccurrence:
+    """Sparse symmetric matrix of how many dreams each pair of symbols shares.
+    
+    pairs[a][b] is the number of dreams interpreted with both a and b, and
+    symbol_dreams[a] the number interpreted with a. A dream has one row
+    per matched symbol and its interpretations are saved together, so each
+    run of rows with the same dream_id counts as one dream.
+    """
+    
+    def __init__(self):
+        self.total_dreams = 0
+        self.symbol_dreams = Counter()
+        # symbol_id -> Counter of the other symbol_id
+        self.pairs = {}
+    
+    @classmethod
+    def from_data(cls, data):
+        """Count the pairs of all saved interpretations in one pass"""
+        cooccurrence = cls()
+        cooccurrence.total_dreams = len(data['dreams'])
+        interpretations = data['interpretations']
+        dream_ids = column(interpretations, 'dream_id')
+        symbol_ids = column(interpretations, 'symbol_id')
+        cooccurrence.symbol_dreams.update(symbol_ids)
+        # Rows `distance` apart pair up when they belong to the same dream.
+        # Only rows that matched at one distance can match at the next, so
+        # each pass runs C-level iterators over a shrinking list of rows
+        # instead of a Python loop per dream.
+        pair_counts = Counter()
+        starts = range(len(dream_ids) - 1)
+        distance = 1
+        while starts:
+            partners = list(map(add, starts, repeat(distance)))
+            same_dream = list(map(eq, map(dream_ids.__getitem__, starts), map(dream_ids.__getitem__, partners)))
+            starts = list(compress(starts, same_dream))
+            pair_counts.update(zip(map(symbol_ids.__getitem__, starts),
+                                   map(symbol_ids.__getitem__, compress(partners, same_dream))))
+            distance += 1
+            if starts and starts[-1] + distance >= len(dream_ids):
+                starts.pop()
+        for (a, b), dreams in pair_counts.items():
+            if a != b:
+                cooccurrence.pairs.setdefault(a, Counter())[b] += dreams
+                cooccurrence.pairs.setdefault(b, Counter())[a] += dreams
+        return cooccurrence
+    
+    def add_dream_symbols(self, symbol_ids):
+        """Count the symbols of one newly interpreted dream"""
+        self.symbol_dreams.update(symbol_ids)
+        for a, b in combinations(symbol_ids, 2):
+            if a != b:
+                self.pairs.setdefault(a, Counter())[b] += 1
+                self.pairs.setdefault(b, Counter())[a] += 1
+    
+    def score(self, a, b, scoring='lift'):
+        """Lift P(a, b) / (P(a) P(b)) over all dreams, or its log2 (PMI)"""
+        lift = self.pairs[a][b] * self.total_dreams / (self.symbol_dreams[a] * self.symbol_dreams[b])
+        return math.log2(lift) if scoring == 'pmi' else lift
+    
+    def related(self, symbol_id, k=5, scoring='lift', min_dreams=MIN_PAIR_DREAMS):
+        """Top k (other_id, dreams, score) for symbols that appear with symbol_id"""
+        candidates = [(other, count, self.score(symbol_id, other, scoring))
+                      for other, count in self.pairs.get(symbol_id, {}).items() if count >= min_dreams]
+        return heapq.nlargest(k, candidates, key=lambda item: (item[2], item[1]))
+    
+    def top_pairs(self, k=10, scoring='lift', min_dreams=MIN_PAIR_DREAMS):
+        """Top k (a, b, dreams, score) over all pairs, each pair once"""
+        candidates = [(a, b, count, self.score(a, b, scoring))
+                      for a, others in self.pairs.items()
+                      for b, count in others.items() if a < b and count >= min_dreams]
+        return heapq.nlargest(k, candidates, key=lambda item: (item[3], item[2]))
+    
+    def differences(self, other):
+        """List human-readable differences from another CoOccurrence"""
+        problems = []
+        if self.symbol_dreams != other.symbol_dreams:
+            problems.append("dreams per symbol differ")
+        for symbol_id in set(self.pairs) | set(other.pairs):
+            if self.pairs.get(symbol_id, Counter()) != other.pairs.get(symbol_id, Counter()):
+                problems.append(f"co-occurrences of symbol {symbol_id} differ")
+        return problems
+
+
+class DreamAggregates:
+    """Dream, symbol-frequency and emotional-tone counters.
+    
+    Updated as dreams and interpretations are saved so that statistics are
+    read directly instead of being recomputed from the interpretations list.
+    """
+    
+    def __init__(self):
+        self.total_dreams = 0
+        self.symbol_counts = Counter()
+        self.tone_counts = Counter()
+        self.rollups = DailyRollups()
+        self.cooccurrence = CoOccurrence()
+    
+    @classmethod
+    def from_data(cls, data, symbols_by_id):
+        """Compute the aggregates from scratch"""
+        aggregates = cls()
+        aggregates.total_dreams = len(data['dreams'])
+        # Count per symbol first; keys keep first-occurrence order, so ties
+        # in top_symbols break the same way as adding rows one by one
+        counts = Counter(column(data['interpretations'], 'symbol_id'))
+        for symbol_id, count in counts.items():
+            symbol = symbols_by_id.get(symbol_id)
+            if symbol:
+                aggregates.symbol_counts[symbol_id] = count
+                aggregates.tone_counts[symbol['emotional_tone']] += count
+        aggregates.rollups = DailyRollups.from_data(data, symbols_by_id)
+        aggregates.cooccurrence = CoOccurrence.from_data(data)
+        return aggregates
+    
+    def add_dream(self, day=None):
+        self.total_dreams += 1
+        self.rollups.add_dream(day)
+        self.cooccurrence.total_dreams += 1
+    
+    def add_interpretation(self, symbol, day=None):
+        """Count one interpretation of `symbol` on `day`; unknown symbols are ignored"""
+        if symbol:
+            self.symbol_counts[symbol['id']] += 1
+            self.tone_counts[symbol['emotional_tone']] += 1
+            self.rollups.add_interpretation(day, symbol['id'])
+    
+    def summary(self):
+        """Dream and symbol totals, daily rollups and co-occurrences as plain dicts.
+        
+        json.dump writes the integer keys as strings; see
+        partitions.read_summary for the way back.
+        """
+        rollups = self.rollups
+        cooccurrence = self.cooccurrence
+        return {
+            'total_dreams': self.total_dreams,
+            'symbol_counts': dict(self.symbol_counts),
+            'days': {day: [rollups.dream_counts[day], dict(rollups.symbol_counts[day])] for day in rollups.days},
+            'symbol_dreams': dict(cooccurrence.symbol_dreams),
+            # Each pair once, under the smaller symbol ID
+            'pairs': {a: {b: count for b, count in others.items() if a < b}
+                      for a, others in cooccurrence.pairs.items() if any(a < b for b in others)}
+        }
+    
+    def add_summary(self, summary, symbols_by_id):
+        """Add the totals of another DreamAggregates.summary(); unknown symbols are ignored"""
+        self.total_dreams += summary['total_dreams']
+        for symbol_id, count in summary['symbol_counts'].items():
+            symbol = symbols_by_id.get(symbol_id)
+            if symbol:
+                self.symbol_counts[symbol_id] += count
+                self.tone_counts[symbol['emotional_tone']] += count
+        rollups = self.rollups
+        for day, (dreams, symbol_counts) in summary['days'].items():
+            rollups.add_dream(day, dreams)
+            rollups.symbol_counts[day].update(symbol_counts)
+        cooccurrence = self.cooccurrence
+        cooccurrence.total_dreams += summary['total_dreams']
+        cooccurrence.symbol_dreams.update(summary['symbol_dreams'])
+        pairs = cooccurrence.pairs
+        for a, others in summary['pairs'].items():
+            row = pairs.get(a)
+            if row is None:
+                row = pairs[a] = Counter()
+            row.update(others)
+            for b, count in others.items():
+                row = pairs.get(b)
+                if row is None:
+                    row = pairs[b] = Counter()
+                row[a] += count
+    
+    def top_symbols(self, k):
+        """Return the k most frequent (symbol_id, count) pairs"""
+        return heapq.nlargest(k, self.symbol_counts.items(), key=lambda item: item[1])
+    
+    def differences(self, other):
+        """List human-readable differences from another DreamAggregates"""
+        problems = []
+        if self.total_dreams != other.total_dreams:
+            problems.append(f"total_dreams: {self.total_dreams} != {other.total_dreams}")
+        for symbol_id in set(self.symbol_counts) | set(other.symbol_counts):
+            if self.symbol_counts[symbol_id] != other.symbol_counts[symbol_id]:
+                problems.append(f"symbol {symbol_id}: {self.symbol_counts[symbol_id]} "
+                                f"!= {other.symbol_counts[symbol_id]}")
+        for tone in set(self.tone_counts) | set(other.tone_counts):
+            if self.tone_counts[tone] != other.tone_counts[tone]:
+                problems.append(f"tone {tone!r}: {self.tone_counts[tone]} != {other.tone_counts[tone]}")
+        problems.extend(self.rollups.differences(other.rollups))
+        problems.extend(self.cooccurrence.differences(other.cooccurrence))
+        return problems
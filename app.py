@@ -1,9 +1,92 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from dreamvista import DreamVista  # make sure dreamvista.py exists in same folder
+import gzip
+import os
+import time
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, g, jsonify, session
+from dreamvista import DreamVista, SAVE_ERROR  # make sure dreamvista.py exists in same folder
+from aggregates import GRANULARITIES
+from records import day_ordinal
+from result_cache import LRUCache
+from text_index import parse_query
 
 app = Flask(__name__)
 app.secret_key = "dream_vista_secret"
-dream_app = DreamVista()
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# Kept below dreamvista.POOL_MIN_DREAMS so web requests never start a process pool;
+# larger archives go through `python dreamvista.py import`
+BATCH_MAX_DREAMS = 1000
+# DREAM_VISTA_STORAGE: json (default), journal or sqlite
+# DREAM_VISTA_SHARED=1 when several gunicorn workers share the journal
+# DREAM_VISTA_WRITE_BEHIND=1 to persist from a background thread (single process only)
+# DREAM_VISTA_SNAPSHOT=1 to start from a binary snapshot with lazily loaded dream texts
+# DREAM_VISTA_PARTITIONS=1 to keep each user's dreams (?user=NAME) in their own file,
+# with at most DREAM_VISTA_MAX_PARTITIONS users loaded at once
+dream_app = DreamVista(storage=os.environ.get('DREAM_VISTA_STORAGE', 'json'),
+                       shared=os.environ.get('DREAM_VISTA_SHARED') == '1',
+                       write_behind=os.environ.get('DREAM_VISTA_WRITE_BEHIND') == '1',
+                       flush_interval=float(os.environ.get('DREAM_VISTA_FLUSH_INTERVAL', '1.0')),
+                       cache_size=int(os.environ.get('DREAM_VISTA_CACHE_SIZE', '1024')),
+                       snapshot=os.environ.get('DREAM_VISTA_SNAPSHOT') == '1',
+                       partitions=os.environ.get('DREAM_VISTA_PARTITIONS') == '1',
+                       max_partitions=int(os.environ.get('DREAM_VISTA_MAX_PARTITIONS', '8')),
+                       # DREAM_VISTA_INDEX_ON_START=0 leaves the full-text index to the first search
+                       # instead of building it in the background after every load
+                       index_text=os.environ.get('DREAM_VISTA_INDEX_ON_START', '1') == '1')
+# DREAM_VISTA_SLOW_REQUEST_MS: log requests slower than this many milliseconds
+SLOW_REQUEST_MS = float(os.environ.get('DREAM_VISTA_SLOW_REQUEST_MS', '0'))
+# DREAM_VISTA_API_MAX_AGE: seconds clients and CDNs may reuse a /api response without revalidating it
+API_MAX_AGE = int(os.environ.get('DREAM_VISTA_API_MAX_AGE', '0'))
+# Smaller JSON bodies are sent uncompressed
+GZIP_MIN_BYTES = 1024
+# Encoded /api bodies keyed by URL and data tag, for clients that have no ETag yet
+api_bodies = LRUCache(int(os.environ.get('DREAM_VISTA_API_CACHE_SIZE', '256')))
+request_seconds = dream_app.metrics.histogram(
+    'dream_vista_request_seconds', 'Request latency per route', ['route', 'method', 'status'])
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.before_request
+def open_user_partition():
+    """Point g.vista at the dreams of the user named by ?user= (remembered in the session)"""
+    g.vista = dream_app
+    if dream_app.partitions is None:
+        return
+    if 'user' in request.values:
+        session['user'] = request.values['user'].strip() or None
+    user = session.get('user')
+    if user:
+        try:
+            g.vista = dream_app.partitions.acquire(user)
+            g.user = user
+        except ValueError as e:
+            session.pop('user')
+            flash(str(e), "warning")
+
+
+@app.teardown_request
+def release_user_partition(error=None):
+    user = g.pop('user', None)
+    if user is not None:
+        dream_app.partitions.release(user)
+
+
+@app.after_request
+def record_request_time(response):
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_seconds.observe(elapsed, route, request.method, str(response.status_code))
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        app.logger.warning("Slow request: %s %s took %.1f ms (status %s)",
+                           request.method, request.full_path.rstrip('?'), elapsed * 1000,
+                           response.status_code)
+    return response
 
 
 @app.route('/')
@@ -18,9 +101,27 @@ def interpret():
     if dream_text.strip() == '':
         flash("Please describe your dream!", "warning")
         return redirect(url_for('home'))
-    results = dream_app.analyze_dream(dream_text)
+    results = g.vista.analyze_dream(dream_text)
+    related = g.vista.related_symbols([r['symbol']['id'] for r in results])
     # re-render index with results and previous dream text
-    return render_template('index.html', results=results, dream_text=dream_text)
+    return render_template('index.html', results=results, dream_text=dream_text, related=related)
+
+
+@app.route('/interpret/batch', methods=['POST'])
+def interpret_batch():
+    payload = request.get_json(silent=True)
+    dreams = payload.get('dreams') if isinstance(payload, dict) else payload
+    if not isinstance(dreams, list):
+        return jsonify(error='Expected a JSON list of dreams or {"dreams": [...]}'), 400
+    if len(dreams) > BATCH_MAX_DREAMS:
+        return jsonify(error=f"At most {BATCH_MAX_DREAMS} dreams per request"), 413
+    results = g.vista.analyze_dreams(dreams)
+    for result in results:
+        result['matched_symbols'] = [dict(match['symbol'], relevance=match['relevance'])
+                                     for match in result['matched_symbols']]
+    if any(result.get('error') == SAVE_ERROR for result in results):
+        return jsonify(error="The dreams could not be saved", results=results), 500
+    return jsonify(results=results)
 
 
 @app.route('/add-symbol', methods=['GET', 'POST'])
@@ -35,9 +136,14 @@ def add_symbol():
             flash("Symbol name and meaning are required.", "warning")
             return redirect(url_for('add_symbol'))
 
+        similar = dream_app.similar_symbols(symbol)
         success = dream_app.add_custom_symbol(symbol, meaning, tone, category, keywords)
         if success:
             flash(f"Symbol '{symbol}' added successfully!", "success")
+            if similar:
+                names = ', '.join(f"'{s['symbol']}'" for s in similar)
+                flash(f"'{symbol}' looks similar to existing symbols: {names}. "
+                      f"Check it is not a duplicate.", "warning")
         else:
             flash(f"Failed to add symbol '{symbol}'. It may already exist.", "danger")
         return redirect(url_for('add_symbol'))
@@ -45,28 +151,165 @@ def add_symbol():
     return render_template('add_symbol.html')
 
 
-@app.route('/stats')
-def stats():
-    data = dream_app.get_dream_statistics() or {}
+def stats_params():
+    """from, to and granularity of a /stats request, and an error message for bad dates"""
+    date_from = request.args.get('from', '').strip() or None
+    date_to = request.args.get('to', '').strip() or None
+    granularity = request.args.get('granularity', '').strip() or None
+    date_error = None
+    if any(value and day_ordinal(value) is None for value in (date_from, date_to)):
+        date_error = "Dates must be in YYYY-MM-DD format."
+        date_from = date_to = None
+    if granularity not in GRANULARITIES:
+        granularity = None
+    return date_from, date_to, granularity, date_error
+
+
+def dream_statistics(date_from, date_to, granularity):
+    """Statistics for /stats, over every user's dreams when no user is selected"""
+    all_users = g.vista is dream_app
+    data = g.vista.get_dream_statistics(date_from, date_to, granularity, all_users=all_users) or {}
     # ensure keys exist to avoid template errors
     data.setdefault('total_dreams', 0)
     data.setdefault('common_symbols', [])
     data.setdefault('emotional_tones', [])
-    return render_template('stats.html', stats=data)
+    return data, g.vista.symbol_associations(all_users=all_users)
 
 
-@app.route('/search', methods=['GET', 'POST'])
-def search():
+@app.route('/stats')
+def stats():
+    # stats.html does not show flashed messages, so bad dates are shown inline
+    date_from, date_to, granularity, date_error = stats_params()
+    data, associations = dream_statistics(date_from, date_to, granularity)
+    return render_template('stats.html', stats=data, associations=associations, user=g.get('user'),
+                           date_from=date_from, date_to=date_to, granularity=granularity,
+                           granularities=GRANULARITIES, date_error=date_error)
+
+
+def replace_symbol_filter(query, name, replacement):
+    """Swap the symbol:NAME filter for `name` in a search query"""
+    for written in (f'symbol:"{name}"', f'symbol:{name}'):
+        if written in query:
+            return query.replace(written, f'symbol:"{replacement}"', 1)
+    return query
+
+
+def search_params():
+    """Query, symbol, offset and page size of a search request"""
+    query = request.values.get('q', '').strip()
+    symbol = request.values.get('symbol', '').strip()
+    offset = max(request.values.get('offset', 0, type=int), 0)
+    limit = min(max(request.values.get('limit', SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_PAGE_SIZE)
+    return query, symbol, offset, limit
+
+
+def find_dreams(query, symbol, offset, limit):
+    """One page of search results, whether there are more, and "did you mean"
+    (name, query, symbol) suggestions for symbol names that are not symbols"""
     dreams = None
-    symbol = ''
-    if request.method == 'POST':
-        symbol = request.form.get('symbol', '').strip()
+    has_more = False
+    # fetch one extra row to know whether there is a next page
+    if query:
+        # Full-text search, narrowed to the symbol if one is given too
+        full_query = f'{query} symbol:"{symbol}"' if symbol else query
+        dreams = g.vista.search_dreams(full_query, offset=offset, limit=limit + 1)
+    elif symbol:
+        dreams = g.vista.search_dreams_by_symbol(symbol, offset=offset, limit=limit + 1)
+    if dreams is not None:
+        has_more = len(dreams) > limit
+        dreams = dreams[:limit]
+    suggestions = []
+    if not dreams:
         if symbol:
-            dreams = dream_app.search_dreams_by_symbol(symbol)
-        else:
-            flash("Please enter a symbol to search.", "warning")
-            return redirect(url_for('search'))
-    return render_template('search.html', dreams=dreams, symbol=symbol)
+            suggestions += [(name, query, name) for name in g.vista.suggest_symbols(symbol)]
+        for name in parse_query(query)[2]:
+            suggestions += [(suggested, replace_symbol_filter(query, name, suggested), symbol)
+                            for suggested in g.vista.suggest_symbols(name)]
+    return dreams, has_more, suggestions
+
+
+@app.route('/search', methods=['GET', 'POST'])
+def search():
+    query, symbol, offset, limit = search_params()
+    if request.method == 'POST' and not symbol and not query:
+        flash("Please enter words or a symbol to search.", "warning")
+        return redirect(url_for('search'))
+    dreams, has_more, suggestions = find_dreams(query, symbol, offset, limit)
+    suggestions = [(name, url_for('search', q=suggested_query or None, symbol=suggested_symbol or None))
+                   for name, suggested_query, suggested_symbol in suggestions]
+    return render_template('search.html', dreams=dreams, query=query, symbol=symbol,
+                           offset=offset, limit=limit, has_more=has_more, suggestions=suggestions)
+
+
+def conditional_json(tag, build):
+    """Serve build() as JSON with `tag` as a weak ETag.
+    
+    A client whose If-None-Match already holds the tag gets 304 Not
+    Modified, and a body built earlier for the same URL and tag is
+    reused, so build() only runs when the data has changed. Bodies are
+    gzipped for clients that accept it.
+    """
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        use_gzip = request.accept_encodings['gzip'] > 0
+        key = (request.full_path, tag, use_gzip)
+        cached = api_bodies.get(key)
+        if cached is None:
+            body = app.json.dumps(build()).encode()
+            encoding = None
+            if use_gzip and len(body) >= GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=6)
+                encoding = 'gzip'
+            cached = (body, encoding)
+            api_bodies.put(key, cached)
+        body, encoding = cached
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(tag, weak=True)
+    # A user's own dreams must not be shared through a CDN
+    response.headers['Cache-Control'] = f"{'private' if g.get('user') else 'public'}, max-age={API_MAX_AGE}"
+    response.vary.add('Accept-Encoding')
+    if dream_app.partitions is not None:
+        # The user comes from the session cookie
+        response.vary.add('Cookie')
+    return response
+
+
+@app.route('/api/symbols')
+def api_symbols():
+    return conditional_json(g.vista.catalog_tag(), lambda: {'symbols': g.vista.list_symbols()})
+
+
+@app.route('/api/stats')
+def api_stats():
+    date_from, date_to, granularity, date_error = stats_params()
+    if date_error:
+        return jsonify(error=date_error), 400
+    
+    def build():
+        data, associations = dream_statistics(date_from, date_to, granularity)
+        return dict(data, associations=associations)
+    return conditional_json(g.vista.data_tag(all_users=g.vista is dream_app), build)
+
+
+@app.route('/api/search')
+def api_search():
+    query, symbol, offset, limit = search_params()
+    if not query and not symbol:
+        return jsonify(error="Expected q= words or a symbol= to search for"), 400
+    
+    def build():
+        dreams, has_more, suggestions = find_dreams(query, symbol, offset, limit)
+        return {'dreams': dreams or [], 'offset': offset, 'limit': limit, 'has_more': has_more,
+                'suggestions': [name for name, _, _ in suggestions]}
+    return conditional_json(g.vista.data_tag(), build)
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(dream_app.metrics_text(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
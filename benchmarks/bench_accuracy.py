@@ -0,0 +1,60 @@
+"""Precision, recall and throughput of symbol matching on labeled dreams.
+
+benchmarks/matcher_fixture.json holds dreams written against the seed
+symbol catalog, each with the symbols a reader would expect. The
+original substring scan and the token matcher are scored on it (micro
+averaged over all symbol labels) and timed on the fixture texts.
+
+    python -m benchmarks.bench_accuracy
+"""
+import json
+import os
+
+from symbol_matcher import SymbolMatcher
+from benchmarks.bench_matcher import legacy_match
+from benchmarks.common import seed_symbols, time_calls, percentile
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'matcher_fixture.json')
+ROUNDS = 20
+
+
+def score(match, cases):
+    """(precision, recall, false positives, false negatives) over all cases"""
+    true_positives = false_positives = false_negatives = 0
+    mistakes = []
+    for case in cases:
+        found = {symbol['symbol'] for symbol, _ in match(case['text'])}
+        expected = set(case['symbols'])
+        true_positives += len(found & expected)
+        false_positives += len(found - expected)
+        false_negatives += len(expected - found)
+        if found != expected:
+            mistakes.append((case['text'], sorted(found - expected), sorted(expected - found)))
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 1.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 1.0
+    return precision, recall, mistakes
+
+
+def main(verbose=False):
+    with open(FIXTURE) as f:
+        cases = json.load(f)
+    symbols = seed_symbols()
+    matcher = SymbolMatcher(symbols)
+    texts = [(case['text'],) for case in cases] * ROUNDS
+    
+    print(f"{len(cases)} labeled dreams, {sum(len(c['symbols']) for c in cases)} expected symbols")
+    print(f"{'matcher':<10} {'precision':>9} {'recall':>7} {'F1':>6} {'p50 ms':>8} {'dreams/s':>9}")
+    for name, match in (('substring', lambda text: legacy_match(symbols, text)), ('token', matcher.match)):
+        precision, recall, mistakes = score(match, cases)
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        latencies = time_calls(match, texts)
+        print(f"{name:<10} {precision:>9.3f} {recall:>7.3f} {f1:>6.3f} {percentile(latencies, 50):>8.4f} "
+              f"{len(latencies) / (sum(latencies) / 1000):>9.0f}")
+        if verbose:
+            for text, extra, missing in mistakes:
+                print(f"    {text!r}: extra {extra}, missing {missing}")
+
+
+if __name__ == '__main__':
+    import sys
+    main(verbose='-v' in sys.argv)
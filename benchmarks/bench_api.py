@@ -0,0 +1,72 @@
+"""Latency of the JSON API with and without conditional requests.
+
+Each endpoint is requested through the Flask test client in three ways:
+with the body cache cleared, so the answer is computed and encoded
+again; with no ETag, so the encoded body is reused; and with the current
+ETag in If-None-Match, which gets 304 Not Modified. Responses are
+gzipped as for a browser.
+
+    python -m benchmarks.bench_api [--dreams 100000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from benchmarks.common import percentile, time_calls
+from benchmarks.corpus import generate_dataset, write_dataset
+
+REQUESTS = 50
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(dreams):
+    print(f"Generating {dreams} dreams...")
+    data = generate_dataset(dreams=dreams)
+    symbol = data['symbols'][0]['symbol']
+    word = data['dreams'][0]['dream_text'].split()[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dataset(os.path.join(tmp, 'dream_vista_data.json'), data)
+        del data
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            # app.py loads dream_vista_data.json from the working directory on import
+            os.environ['DREAM_VISTA_STORAGE'] = 'json'
+            with contextlib.redirect_stdout(io.StringIO()):
+                sys.path.insert(0, REPO)
+                import app
+            app.app.template_folder = REPO
+            client = app.app.test_client()
+            
+            print(f"\n{'endpoint':<28} {'computed p50 ms':>16} {'cached p50 ms':>14} {'304 p50 ms':>11}")
+            for url in ('/api/symbols', '/api/stats', f'/api/search?q={word}', f'/api/search?symbol={symbol}'):
+                headers = {'Accept-Encoding': 'gzip'}
+                etag = client.get(url, headers=headers).headers['ETag']
+                
+                def computed():
+                    app.api_bodies.clear()
+                    client.get(url, headers=headers)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fresh = time_calls(computed, [()] * REQUESTS)
+                    cached = time_calls(lambda: client.get(url, headers=headers), [()] * REQUESTS)
+                    not_modified = time_calls(lambda: client.get(url, headers=dict(headers, **{'If-None-Match': etag})),
+                                              [()] * REQUESTS)
+                print(f"{url:<28} {percentile(fresh, 50):>16.2f} {percentile(cached, 50):>14.2f} "
+                      f"{percentile(not_modified, 50):>11.2f}")
+            app.dream_app.close()
+        finally:
+            os.chdir(cwd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON API conditional request benchmark")
+    parser.add_argument('--dreams', type=int, default=100000)
+    args = parser.parse_args(argv)
+    run(args.dreams)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Time save_interpretations against a large interpretations table.
+
+Compares the original max()-per-row ID allocation with the block
+reservation from DreamVista.reserve_ids. Persistence is stubbed out so
+only the in-memory work is measured.
+
+    python -m benchmarks.bench_ids [existing_rows]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from dreamvista import DreamVista
+from storage import DreamStore
+
+EXISTING_ROWS = 1_000_000
+MATCHES_PER_DREAM = 10
+CALLS = 20
+
+
+class NullStore(DreamStore):
+    """Store that discards writes"""
+    
+    def exists(self):
+        return False
+    
+    def save(self, data):
+        pass
+    
+    def append(self, data, op, payload):
+        pass
+
+
+def legacy_save_interpretations(vista, dream_id, matched_symbols):
+    """The original save_interpretations loop, one max() scan per row"""
+    for match in matched_symbols:
+        interpretation = {
+            'id': max(item['id'] for item in vista.data['interpretations']) + 1,
+            'dream_id': dream_id,
+            'symbol_id': match['symbol']['id'],
+            'relevance_score': match['relevance']
+        }
+        vista.data['interpretations'].append(interpretation)
+
+
+def build_vista(rows):
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        vista = DreamVista(os.path.join(tmp, 'bench.json'))
+    vista.store = NullStore()
+    vista.data['interpretations'] = [
+        {'id': i + 1, 'dream_id': i // 3 + 1, 'symbol_id': i % 20 + 1, 'relevance_score': 7}
+        for i in range(rows)
+    ]
+    vista.init_id_counters()
+    return vista
+
+
+def timed(func, vista, matches):
+    start = time.perf_counter()
+    for call in range(CALLS):
+        func(vista, call + 1, matches)
+    return (time.perf_counter() - start) * 1000 / CALLS
+
+
+def run(rows=EXISTING_ROWS):
+    vista = build_vista(rows)
+    matches = [{'symbol': s, 'relevance': 10} for s in vista.data['symbols'][:MATCHES_PER_DREAM]]
+    
+    before = timed(legacy_save_interpretations, vista, matches)
+    del vista.data['interpretations'][rows:]
+    vista.init_id_counters()
+    after = timed(DreamVista.save_interpretations, vista, matches)
+    
+    print(f"save_interpretations with {rows:,} existing rows, {MATCHES_PER_DREAM} matches per dream")
+    print(f"  before (max() per row): {before:10.3f} ms/call")
+    print(f"  after  (ID counters):   {after:10.3f} ms/call")
+    print(f"  speedup:                {before / max(after, 1e-9):10.0f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interpretation ID allocation benchmark")
+    parser.add_argument('existing_rows', nargs='?', type=int, default=EXISTING_ROWS,
+                        help="interpretations already in the table")
+    args = parser.parse_args(argv)
+    run(args.existing_rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compare the token matcher's speed with the original per-symbol scan.
+
+The two do not return the same symbols: the scan matches substrings, the
+matcher whole (stemmed) words. benchmarks/bench_accuracy.py compares
+their results. Run from the repository root:
+
+    python -m benchmarks.bench_matcher [sizes ...]
+"""
+import argparse
+import random
+import time
+
+from symbol_matcher import SymbolMatcher
+from benchmarks.common import synthetic_symbols, synthetic_dream, time_calls, percentile
+
+CATALOG_SIZES = [20, 2000, 50000]
+DREAMS_PER_SIZE = 200
+
+
+def legacy_match(symbols, dream_text):
+    """The original DreamVista.analyze_dream matching loop"""
+    dream_text_lower = dream_text.lower()
+    matched_symbols = []
+    for symbol in symbols:
+        if symbol['symbol'].lower() in dream_text_lower:
+            matched_symbols.append((symbol, 10))
+            continue
+        if symbol['keywords']:
+            keywords = [kw.strip() for kw in symbol['keywords'].split(',')]
+            for keyword in keywords:
+                if keyword.lower() in dream_text_lower:
+                    matched_symbols.append((symbol, 7))
+                    break
+    return matched_symbols
+
+
+def run(sizes=CATALOG_SIZES, dreams=DREAMS_PER_SIZE):
+    print(f"{'symbols':>8} {'build ms':>9} {'legacy p50':>11} {'legacy p99':>11} "
+          f"{'matcher p50':>12} {'matcher p99':>12} {'speedup':>8}")
+    for size in sizes:
+        rng = random.Random(size)
+        symbols = synthetic_symbols(size)
+        texts = [(synthetic_dream(rng, symbols),) for _ in range(dreams)]
+        
+        start = time.perf_counter()
+        matcher = SymbolMatcher(symbols)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        legacy = time_calls(lambda text: legacy_match(symbols, text), texts)
+        compiled = time_calls(matcher.match, texts)
+        speedup = percentile(legacy, 50) / max(percentile(compiled, 50), 1e-9)
+        print(f"{size:>8} {build_ms:>9.1f} {percentile(legacy, 50):>11.3f} {percentile(legacy, 99):>11.3f} "
+              f"{percentile(compiled, 50):>12.3f} {percentile(compiled, 99):>12.3f} {speedup:>7.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Token matcher vs per-symbol scan benchmark")
+    parser.add_argument('sizes', nargs='*', type=int, default=CATALOG_SIZES, help="catalog sizes to measure")
+    args = parser.parse_args(argv)
+    run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
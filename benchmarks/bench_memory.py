@@ -0,0 +1,77 @@
+"""Memory held by dreams and interpretations, as dicts and in compact form.
+
+A dataset with the given number of interpretations (two per dream on
+average) is written to JSON and each collection is loaded twice: once
+kept as the dict rows json.load produces and once converted to
+DreamRecord objects / an InterpretationTable. tracemalloc measures what
+stays allocated after each load.
+
+    python -m benchmarks.bench_memory [interpretations]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.corpus import generate_dataset, write_dataset
+from records import DreamRecord, InterpretationTable
+
+INTERPRETATIONS = 1_000_000
+
+
+def retained(build):
+    """Run build() and return its result and the bytes it left allocated"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def load(path, collection):
+    with open(path) as f:
+        return json.load(f)[collection]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory of dict rows vs compact records")
+    parser.add_argument('interpretations', nargs='?', type=int, default=INTERPRETATIONS,
+                        help="interpretations in the dataset")
+    interpretations = parser.parse_args(argv).interpretations
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dream_vista_data.json')
+        data = generate_dataset(dreams=interpretations // 2)
+        rows = {collection: len(data[collection]) for collection in ('dreams', 'interpretations')}
+        write_dataset(path, data)
+        del data
+        
+        results = {}
+        text_bytes = 0
+        for collection, compact in (('interpretations', InterpretationTable.from_rows),
+                                    ('dreams', lambda dreams: [DreamRecord.from_dict(d) for d in dreams])):
+            before, before_size = retained(lambda: load(path, collection))
+            if collection == 'dreams':
+                text_bytes = sum(sys.getsizeof(dream['dream_text']) for dream in before)
+            del before
+            after, after_size = retained(lambda: compact(load(path, collection)))
+            del after
+            results[collection] = (before_size, after_size)
+    
+    print(f"{'collection':<16} {'rows':>10} {'dicts':>10} {'compact':>10} {'per row':>17}")
+    for collection, (before_size, after_size) in results.items():
+        count = rows[collection]
+        print(f"{collection:<16} {count:>10,} {before_size / 2**20:>7.1f} MB {after_size / 2**20:>7.1f} MB "
+              f"{before_size / count:>6.0f} -> {after_size / count:>4.0f} B")
+    before_size, after_size = results['dreams']
+    count = rows['dreams']
+    print(f"dreams without their texts ({text_bytes / 2**20:.1f} MB in both forms): "
+          f"{(before_size - text_bytes) / count:.0f} -> {(after_size - text_bytes) / count:.0f} B per row")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""One shared data file against per-user partitions, with JSON storage.
+
+The same synthetic dreams are written twice: all in one data file, and
+spread over per-user partition files next to a catalog holding only the
+symbols. For each layout the benchmark reports the startup time, the
+latency of saving one dream for a random user (the single file is
+rewritten whole; a partition is loaded unless it is among the
+`--max-loaded` most recent and only its file is rewritten), and global
+statistics. The first global statistics call over partitions loads each
+one to write its summary; later calls only read summaries.
+
+    python -m benchmarks.bench_partitions [--dreams 100000] [--users 1000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+from urllib.parse import quote
+
+from benchmarks.common import percentile, time_calls
+from benchmarks.corpus import generate_dataset, write_dataset
+from dreamvista import DreamVista
+
+SAVES = 20
+TEXT = 'i was flying over the water and a snake was chasing me'
+
+
+def write_partitions(data, users, directory):
+    """Write the catalog and one partition per user; returns the catalog file"""
+    catalog_file = os.path.join(directory, 'dream_vista_data.json')
+    write_dataset(catalog_file, {'symbols': data['symbols'], 'dreams': [], 'interpretations': []})
+    os.makedirs(os.path.join(directory, 'dream_vista_data.users'))
+    dreams = {user: [] for user in users}
+    interpretations = {user: [] for user in users}
+    owner = {}
+    for dream in data['dreams']:
+        owner[dream['id']] = users[dream['id'] % len(users)]
+        dreams[owner[dream['id']]].append(dream)
+    for interpretation in data['interpretations']:
+        interpretations[owner[interpretation['dream_id']]].append(interpretation)
+    for user in users:
+        write_dataset(os.path.join(directory, 'dream_vista_data.users', quote(user, safe='') + '.json'),
+                      {'symbols': [], 'dreams': dreams[user], 'interpretations': interpretations[user]})
+    return catalog_file
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run(dreams, user_count, max_loaded):
+    print(f"Generating {dreams} dreams for {user_count} users...")
+    data = generate_dataset(dreams=dreams)
+    users = [f'user{number}' for number in range(user_count)]
+    rng = random.Random(dreams)
+    save_users = [(rng.choice(users),) for _ in range(SAVES)]
+    
+    with tempfile.TemporaryDirectory() as single_dir, tempfile.TemporaryDirectory() as partition_dir:
+        single_file = os.path.join(single_dir, 'dream_vista_data.json')
+        write_dataset(single_file, data)
+        catalog_file = write_partitions(data, users, partition_dir)
+        del data
+        
+        print(f"\n{'layout':>12} {'start s':>8} {'save p50 ms':>12} {'save p99 ms':>12} "
+              f"{'stats s':>8} {'stats again s':>14}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            vista, start = timed(lambda: DreamVista(data_file=single_file))
+            saves = time_calls(lambda user: vista.analyze_dream(TEXT), save_users)
+            _, stats = timed(vista.get_dream_statistics)
+            _, stats_again = timed(vista.get_dream_statistics)
+            vista.close()
+        print(f"{'single file':>12} {start:>8.2f} {percentile(saves, 50):>12.1f} {percentile(saves, 99):>12.1f} "
+              f"{stats:>8.2f} {stats_again:>14.2f}")
+        
+        def save_for(user):
+            with vista.for_user(user) as partition:
+                partition.analyze_dream(TEXT)
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            vista, start = timed(lambda: DreamVista(data_file=catalog_file, partitions=True,
+                                                    max_partitions=max_loaded))
+            saves = time_calls(save_for, save_users)
+            _, stats = timed(lambda: vista.get_dream_statistics(all_users=True))
+            _, stats_again = timed(lambda: vista.get_dream_statistics(all_users=True))
+            vista.close()
+        print(f"{'partitioned':>12} {start:>8.2f} {percentile(saves, 50):>12.1f} {percentile(saves, 99):>12.1f} "
+              f"{stats:>8.2f} {stats_again:>14.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-user partitions benchmark")
+    parser.add_argument('--dreams', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--max-loaded', type=int, default=8, help="partitions kept in memory")
+    args = parser.parse_args(argv)
+    run(args.dreams, args.users, args.max_loaded)
+
+
+if __name__ == '__main__':
+    main()
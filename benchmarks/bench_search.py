@@ -0,0 +1,120 @@
+"""Full-text search latency over a synthetic corpus.
+
+Each dream is the usual corpus text (filler words plus symbol mentions)
+followed by words drawn from a Zipf-distributed vocabulary, so queries
+range from words in nearly every dream to words in a handful. The data is
+written to a temporary JSON file and loaded into DreamVista; the time to
+build the word index on the first search is reported separately from
+query latencies. With --sqlite the same data is migrated into an SQLite
+database and searched through its FTS5 index as well.
+
+    python -m benchmarks.bench_search [--dreams 1000000] [--sqlite]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import make_word, percentile, time_calls
+from benchmarks.corpus import generate_dataset, write_dataset
+from dreamvista import DreamVista
+from storage import migrate_json_to_sqlite
+
+VOCABULARY_SIZE = 50000
+EXTRA_WORDS = 20
+QUERIES_PER_KIND = 50
+PAGE_SIZE = 20
+
+
+def add_vocabulary(data, seed=7):
+    """Append EXTRA_WORDS Zipf-distributed words to every dream; returns the vocabulary by rank"""
+    rng = random.Random(seed)
+    vocabulary = []
+    seen = set()
+    while len(vocabulary) < VOCABULARY_SIZE:
+        word = make_word(rng, rng.randint(2, 4))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+    for dream in data['dreams']:
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=EXTRA_WORDS)
+        dream['dream_text'] += ' ' + ' '.join(words)
+    return vocabulary
+
+
+def query_kinds(rng, vocabulary, symbols):
+    """Lists of queries, by kind, from very common to rare words"""
+    def ranked(low, high):
+        return vocabulary[rng.randrange(low, high)]
+    
+    symbol_names = [symbol['symbol'] for symbol in symbols]
+    return {
+        'filler word': ['strange'] * QUERIES_PER_KIND,
+        'common word': [ranked(0, 10) for _ in range(QUERIES_PER_KIND)],
+        'mid word': [ranked(100, 1000) for _ in range(QUERIES_PER_KIND)],
+        'rare word': [ranked(10000, VOCABULARY_SIZE) for _ in range(QUERIES_PER_KIND)],
+        'two words': [f'{ranked(0, 100)} {ranked(100, 1000)}' for _ in range(QUERIES_PER_KIND)],
+        'phrase': [f'"strange place" {ranked(0, 100)}' for _ in range(QUERIES_PER_KIND)],
+        'word + symbol': [f'{ranked(0, 100)} symbol:"{rng.choice(symbol_names)}"'
+                          for _ in range(QUERIES_PER_KIND)],
+    }
+
+
+def report(label, vista, kinds):
+    print(f"\n{label}")
+    print(f"{'query':>14} {'p50 ms':>9} {'p99 ms':>9} {'hits/page':>10}")
+    for kind, queries in kinds.items():
+        hits = [len(vista.search_dreams(query, 0, PAGE_SIZE)) for query in queries[:5]]
+        latencies = time_calls(lambda query: vista.search_dreams(query, 0, PAGE_SIZE),
+                               [(query,) for query in queries])
+        print(f"{kind:>14} {percentile(latencies, 50):>9.2f} {percentile(latencies, 99):>9.2f} "
+              f"{sum(hits) / len(hits):>10.1f}")
+
+
+def run(dreams, sqlite=False):
+    print(f"Generating {dreams} dreams...")
+    data = generate_dataset(dreams=dreams)
+    vocabulary = add_vocabulary(data)
+    kinds = query_kinds(random.Random(dreams), vocabulary, data['symbols'])
+    
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, 'dream_vista_data.json')
+        write_dataset(data_file, data)
+        del data
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            vista = DreamVista(data_file=data_file)
+        start = time.perf_counter()
+        text_index = vista.get_text_index()
+        print(f"Index build: {time.perf_counter() - start:.1f}s for {len(text_index)} dreams, "
+              f"{len(text_index.postings)} distinct words")
+        report(f"json storage, {dreams} dreams (in-memory BM25)", vista, kinds)
+        vista.close()
+        del vista, text_index
+        
+        if sqlite:
+            db_file = os.path.join(directory, 'dream_vista_data.db')
+            start = time.perf_counter()
+            migrate_json_to_sqlite(data_file, db_file)
+            print(f"\nSQLite migration with FTS5 indexing: {time.perf_counter() - start:.1f}s")
+            with contextlib.redirect_stdout(io.StringIO()):
+                vista = DreamVista(data_file=db_file, storage='sqlite')
+            report(f"sqlite storage, {dreams} dreams (FTS5 bm25)", vista, kinds)
+            vista.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search latency benchmark")
+    parser.add_argument('--dreams', type=int, default=1000000)
+    parser.add_argument('--sqlite', action='store_true', help="also benchmark SQLite FTS5 search")
+    args = parser.parse_args(argv)
+    run(args.dreams, args.sqlite)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Time to first request for the JSON and binary-snapshot startup paths.
+
+A dataset is generated once per size. Each mode then starts a fresh
+Python process that imports app.py (which loads the data) and serves one
+/search request through the Flask test client. The time is measured
+from process start to the response, along with the process's peak RSS.
+The first snapshot start has to parse the JSON and write the snapshot,
+so it is reported separately from the warm start.
+
+    python -m benchmarks.bench_startup [dreams ...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate_dataset, write_dataset
+
+DATASET_SIZES = [1000000]
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the data directory; prints seconds spent inside the child and its peak RSS in MB
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+import app
+app.app.template_folder = {repo!r}
+response = app.app.test_client().get('/search?symbol=' + {symbol!r})
+assert response.status_code == 200, response.status_code
+print(json.dumps({{'inside_s': time.perf_counter() - start,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def first_request(directory, symbol, snapshot):
+    # Without the background full-text index build, which would compete with the first request
+    env = dict(os.environ, DREAM_VISTA_STORAGE='json', DREAM_VISTA_SNAPSHOT='1' if snapshot else '0',
+               DREAM_VISTA_INDEX_ON_START='0')
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD.format(repo=REPO, symbol=symbol)], cwd=directory,
+                            env=env, capture_output=True, text=True, check=True).stdout
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time to first request for JSON and snapshot startup")
+    parser.add_argument('sizes', nargs='*', type=int, default=DATASET_SIZES, help="dreams per dataset")
+    sizes = parser.parse_args(argv).sizes
+    print(f"{'dreams':>9}  {'mode':<15} {'first request':>14} {'peak RSS':>10}")
+    for dreams in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'dream_vista_data.json')
+            data = generate_dataset(dreams=dreams)
+            symbol = data['symbols'][0]['symbol']
+            write_dataset(path, data)
+            del data
+            for mode, snapshot in (('json', False), ('snapshot, cold', True), ('snapshot, warm', True)):
+                elapsed, child = first_request(tmp, symbol, snapshot)
+                print(f"{dreams:>9,}  {mode:<15} {elapsed:>12.2f} s {child['peak_rss_mb']:>7.0f} MB")
+            print(f"{'':>9}  JSON file {os.path.getsize(path) / 2**20:.0f} MB, "
+                  f"snapshot {os.path.getsize(path + '.snap') / 2**20:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
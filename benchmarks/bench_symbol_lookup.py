@@ -0,0 +1,82 @@
+"""Typo-tolerant symbol lookup against a scan of every name and keyword.
+
+Queries are catalog names and keywords with one to three random edits.
+The scan computes the edit distance to every term, as a lookup without
+an index would; the trigram index must find the same closest distance.
+Run from the repository root:
+
+    python -m benchmarks.bench_symbol_lookup [sizes...]
+"""
+import argparse
+import random
+import string
+import time
+
+from symbol_index import SymbolNameIndex, edit_distance, max_edits, normalize
+from symbol_matcher import symbol_patterns
+from benchmarks.common import synthetic_symbols, time_calls, percentile
+
+CATALOG_SIZES = [20, 2000, 50000]
+QUERIES_PER_SIZE = 200
+
+
+def misspell(rng, term):
+    """Apply up to max_edits(term) random insertions, deletions, substitutions or swaps"""
+    for _ in range(rng.randint(1, max(max_edits(term), 1))):
+        position = rng.randrange(len(term) + 1)
+        edit = rng.choice('idst')
+        letter = rng.choice(string.ascii_lowercase)
+        if edit == 'i' or position == len(term):
+            term = term[:position] + letter + term[position:]
+        elif edit == 't' and position + 1 < len(term):
+            term = term[:position] + term[position + 1] + term[position] + term[position + 2:]
+        elif edit == 'd':
+            term = term[:position] + term[position + 1:]
+        else:
+            term = term[:position] + letter + term[position + 1:]
+    return term
+
+
+def scan_closest(terms, query):
+    """Smallest edit distance from the query to any term within max_edits, or None"""
+    limit = max_edits(query)
+    distances = [edit_distance(query, term, limit) for term in terms]
+    closest = min(distances, default=limit + 1)
+    return closest if closest <= limit else None
+
+
+def run(sizes=CATALOG_SIZES, queries=QUERIES_PER_SIZE):
+    print(f"{'symbols':>8} {'terms':>7} {'build ms':>9} {'scan p50':>9} {'scan p99':>9} "
+          f"{'index p50':>10} {'index p99':>10} {'missed':>7}")
+    for size in sizes:
+        rng = random.Random(size)
+        symbols = synthetic_symbols(size)
+        terms = sorted({normalize(pattern) for symbol in symbols for pattern, _ in symbol_patterns(symbol)} - {''})
+        samples = [(misspell(rng, rng.choice(terms)),) for _ in range(queries)]
+        
+        start = time.perf_counter()
+        index = SymbolNameIndex(symbols)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        expected = []
+        scan = time_calls(lambda query: expected.append(scan_closest(terms, query)), samples)
+        indexed = time_calls(lambda query: index.similar(query, limit=5), samples)
+        missed = 0
+        for (query,), closest in zip(samples, expected):
+            found = index.similar(query, limit=1)
+            if closest != (found[0][1] if found else None):
+                missed += 1
+        print(f"{size:>8} {len(terms):>7} {build_ms:>9.1f} {percentile(scan, 50):>9.3f} "
+              f"{percentile(scan, 99):>9.3f} {percentile(indexed, 50):>10.3f} "
+              f"{percentile(indexed, 99):>10.3f} {missed:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Typo-tolerant symbol lookup benchmark")
+    parser.add_argument('sizes', nargs='*', type=int, default=CATALOG_SIZES, help="catalog sizes to measure")
+    args = parser.parse_args(argv)
+    run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Latency of analyze_dream with synchronous vs write-behind persistence.
+
+For each dataset size, a JSON data file with that many existing dreams is
+written and then 100 dreams are interpreted, once with every write going
+straight to disk and once through the write-behind thread. Bytes are
+counted after the final flush. A restart check then saves dreams through
+write-behind journal storage with frequent compactions, reloads the files
+and fails unless every dream and interpretation is there exactly once.
+
+    python -m benchmarks.bench_write_behind [dreams ...]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+from collections import Counter
+import tempfile
+
+from dreamvista import DreamVista
+from benchmarks.common import seed_symbols, synthetic_dream, time_calls, percentile
+
+DATASET_SIZES = [1000, 5000, 20000]
+CALLS = 100
+
+
+def write_dataset(path, dreams):
+    rng = random.Random(dreams)
+    symbols = seed_symbols()
+    data = {'symbols': symbols, 'dreams': [], 'interpretations': []}
+    for dream_id in range(1, dreams + 1):
+        data['dreams'].append({
+            'id': dream_id,
+            'dream_text': synthetic_dream(rng, symbols, length=300),
+            'dream_date': '2025-01-01',
+            'mood_before': None,
+            'recurring': False,
+            'created_at': '2025-01-01 00:00:00'
+        })
+        data['interpretations'].append({
+            'id': dream_id, 'dream_id': dream_id,
+            'symbol_id': rng.randint(1, len(symbols)), 'relevance_score': 10
+        })
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def measure(path, storage, write_behind):
+    with contextlib.redirect_stdout(io.StringIO()):
+        vista = DreamVista(path, storage=storage, write_behind=write_behind)
+    rng = random.Random(7)
+    texts = [(synthetic_dream(rng, vista.data['symbols']),) for _ in range(CALLS)]
+    latencies = time_calls(vista.analyze_dream, texts)
+    vista.flush()
+    stats = vista.persistence_stats()
+    vista.close()
+    return latencies, stats
+
+
+def check_restart(dreams=300, compact_every=5, flush_records=3):
+    """Save through write-behind journal storage, reload, and return a list of problems"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'restart.json')
+        rng = random.Random(dreams)
+        with contextlib.redirect_stdout(io.StringIO()):
+            vista = DreamVista(path, storage='journal', write_behind=True, compact_every=compact_every,
+                               flush_records=flush_records)
+            saved = sum(1 for _ in range(dreams) if vista.analyze_dream(synthetic_dream(rng, vista.data['symbols'])))
+            interpretations = len(vista.data['interpretations'])
+            vista.close()
+            reloaded = DreamVista(path, storage='journal')
+        problems = []
+        for collection, expected in (('dreams', saved), ('interpretations', interpretations)):
+            ids = Counter(row['id'] for row in reloaded.data[collection])
+            if len(reloaded.data[collection]) != expected:
+                problems.append(f"{expected} {collection} saved, {len(reloaded.data[collection])} after restart")
+            if any(count > 1 for count in ids.values()):
+                problems.append(f"duplicate {collection} after restart")
+        if reloaded.get_dream_statistics()['total_dreams'] != saved:
+            problems.append(f"total_dreams is {reloaded.get_dream_statistics()['total_dreams']}, expected {saved}")
+        reloaded.close()
+        return problems
+
+
+def run(sizes=DATASET_SIZES):
+    print(f"{'dreams':>8} {'mode':>18} {'p50 ms':>9} {'p99 ms':>9} {'MB written':>11}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            for storage, write_behind in (('json', False), ('json', True), ('journal', True)):
+                write_dataset(path, size)
+                latencies, stats = measure(path, storage, write_behind)
+                mode = f"{storage}{' write-behind' if write_behind else ''}"
+                print(f"{size:>8} {mode:>18} {percentile(latencies, 50):>9.3f} "
+                      f"{percentile(latencies, 99):>9.3f} {stats['bytes_written'] / 1e6:>11.1f}")
+    
+    problems = check_restart()
+    print("\nRestart after write-behind compactions: " + ("✓ no lost or repeated records" if not problems else ''))
+    for problem in problems:
+        print(f"  ✗ {problem}")
+    return not problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronous vs write-behind persistence benchmark")
+    parser.add_argument('sizes', nargs='*', type=int, default=DATASET_SIZES, help="existing dreams per dataset")
+    args = parser.parse_args(argv)
+    return 0 if run(args.sizes) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
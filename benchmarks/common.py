@@ -0,0 +1,89 @@
+"""Shared helpers for the benchmark scripts"""
+import contextlib
+import io
+import random
+import time
+
+from dreamvista import DreamVista
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'da',
+             'fe', 'gi', 'ho', 'ju', 'pa', 'qi', 'we', 'xo', 'ya', 'bu']
+FILLER = ('i was in a strange place and then i saw something that i could not '
+          'explain while everyone around me kept talking about the old days')
+
+
+def seed_symbols():
+    """Return the 20 built-in symbols from DreamVista.populate_initial_symbols"""
+    vista = DreamVista.__new__(DreamVista)
+    vista.data = {'symbols': [], 'dreams': [], 'interpretations': []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        vista.populate_initial_symbols()
+    return vista.data['symbols']
+
+
+def make_word(rng, syllables=3):
+    """Build a pronounceable nonsense word"""
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def synthetic_symbols(count, seed=42):
+    """Return `count` symbols: the seed catalog followed by generated ones"""
+    rng = random.Random(seed)
+    seeds = seed_symbols()
+    symbols = [dict(s) for s in seeds[:count]]
+    names = {s['symbol'] for s in symbols}
+    while len(symbols) < count:
+        template = seeds[len(symbols) % len(seeds)]
+        name = make_word(rng, rng.randint(3, 5))
+        if name in names:
+            continue
+        names.add(name)
+        keyword_count = len(template['keywords'].split(','))
+        symbols.append({
+            'id': len(symbols) + 1,
+            'symbol': name,
+            'meaning': template['meaning'],
+            'emotional_tone': template['emotional_tone'],
+            'category': template['category'],
+            'keywords': ', '.join(make_word(rng, rng.randint(3, 4))
+                                  for _ in range(keyword_count))
+        })
+    return symbols
+
+
+def synthetic_dream(rng, symbols, length=600):
+    """Build a dream text of about `length` characters mentioning a few symbols"""
+    words = FILLER.split()
+    parts = []
+    size = 0
+    while size < length:
+        if rng.random() < 0.08:
+            symbol = rng.choice(symbols)
+            if rng.random() < 0.5 or not symbol['keywords']:
+                word = symbol['symbol']
+            else:
+                word = rng.choice(symbol['keywords'].split(',')).strip()
+        else:
+            word = rng.choice(words)
+        parts.append(word)
+        size += len(word) + 1
+    return ' '.join(parts)
+
+
+def time_calls(func, args_list):
+    """Call func once per argument and return latencies in milliseconds"""
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,97 @@
+"""Synthetic datasets in the dream_vista_data.json format.
+
+Symbols beyond the 20 seed symbols copy a seed's tone, category and
+keyword count, and dream texts mention symbols by name or keyword the way
+real submissions do, so matching and statistics see realistic densities.
+
+    python -m benchmarks.corpus --dreams 100000 --out dream_vista_data.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import FILLER, synthetic_symbols
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def dream_text(rng, mentions, length):
+    """Filler text of about `length` characters with the given mentions spread through it"""
+    words = FILLER.split()
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(words)
+        parts.append(word)
+        size += len(word) + 1
+    for mention in mentions:
+        parts.insert(rng.randint(0, len(parts)), mention)
+    return ' '.join(parts)
+
+
+def generate_dataset(symbols=20, dreams=1000, interpretations_per_dream=2.0, text_length=300,
+                     days=730, seed=1):
+    """Build a dataset dict with the given shape.
+    
+    Each dream mentions on average `interpretations_per_dream` distinct
+    symbols, half by name and half by keyword, and gets one interpretation
+    row per mention. Dreams are spread evenly over `days` days.
+    """
+    rng = random.Random(seed)
+    catalog = synthetic_symbols(symbols, seed=seed)
+    keywords = [[k.strip() for k in s['keywords'].split(',') if k.strip()] for s in catalog]
+    data = {'symbols': catalog, 'dreams': [], 'interpretations': []}
+    
+    interpretation_id = 1
+    for dream_id in range(1, dreams + 1):
+        created = START_DATE + timedelta(seconds=(dream_id - 1) * days * 86400 // max(dreams, 1))
+        count = min(len(catalog), max(0, round(rng.expovariate(1 / interpretations_per_dream))
+                                      if interpretations_per_dream else 0))
+        chosen = rng.sample(range(len(catalog)), count)
+        mentions = []
+        for position in chosen:
+            by_name = rng.random() < 0.5 or not keywords[position]
+            mentions.append(catalog[position]['symbol'] if by_name else rng.choice(keywords[position]))
+            data['interpretations'].append({
+                'id': interpretation_id,
+                'dream_id': dream_id,
+                'symbol_id': catalog[position]['id'],
+                'relevance_score': 10 if by_name else 7
+            })
+            interpretation_id += 1
+        data['dreams'].append({
+            'id': dream_id,
+            'dream_text': dream_text(rng, mentions, text_length),
+            'dream_date': created.strftime('%Y-%m-%d'),
+            'mood_before': None,
+            'recurring': rng.random() < 0.1,
+            'created_at': created.strftime('%Y-%m-%d %H:%M:%S')
+        })
+    return data
+
+
+def write_dataset(path, data):
+    """Write a dataset the way DreamVista.save_data does"""
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Dream Vista dataset")
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--dreams', type=int, default=1000)
+    parser.add_argument('--interpretations-per-dream', type=float, default=2.0)
+    parser.add_argument('--text-length', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='synthetic_dream_vista_data.json')
+    args = parser.parse_args(argv)
+    data = generate_dataset(args.symbols, args.dreams, args.interpretations_per_dream,
+                            args.text_length, seed=args.seed)
+    write_dataset(args.out, data)
+    print(f"✓ Wrote {len(data['dreams'])} dreams and {len(data['interpretations'])} "
+          f"interpretations to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Multi-process stress test for shared storage.
+
+Starts N worker processes that each interpret dreams against the same data
+file at the same time, with one of them also adding symbols, then checks
+that no dream or interpretation was lost or given a duplicate ID and that
+every worker ends up seeing everyone else's writes. With --threads, each
+worker saves from that many threads at once, like a threaded gunicorn
+worker. Two smaller checks follow: workers starting together on a missing
+data file must not overwrite each other's first dreams, and (for journal
+storage) a torn or corrupt journal line must not lose the records written
+after it. Exits non-zero on failure.
+
+    python -m benchmarks.stress_workers [--storage journal|sqlite] [--workers N] [--dreams M] [--threads T]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from dreamvista import DreamVista
+
+DREAM_TEMPLATES = [
+    'I was flying over the ocean and then started falling',
+    'a snake chased me through an old house',
+    'my teeth falling out during an exam or test',
+    'a dog and a cat were crossing a bridge',
+]
+
+
+def open_vista(data_file, storage, compact_every):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DreamVista(data_file, storage=storage, compact_every=compact_every, shared=True)
+
+
+def worker(worker_id, data_file, storage, dreams, compact_every, threads, barrier, results):
+    vista = open_vista(data_file, storage, compact_every)
+    barrier.wait()
+    saved = 0
+    reloads = 0
+    original_load = vista.load_data
+    
+    def counting_load():
+        nonlocal reloads
+        reloads += 1
+        original_load()
+    
+    vista.load_data = counting_load
+    saved_lock = threading.Lock()
+    
+    def save_dreams(numbers):
+        nonlocal saved
+        for i in numbers:
+            text = f"{DREAM_TEMPLATES[i % len(DREAM_TEMPLATES)]} (worker {worker_id} dream {i})"
+            if worker_id == 0 and i % 10 == 0:
+                vista.add_custom_symbol(f'stress symbol {i}', 'stress test', 'neutral', 'test', f'marker{i}')
+            if vista.analyze_dream(text):
+                with saved_lock:
+                    saved += 1
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        savers = [threading.Thread(target=save_dreams, args=(range(n, dreams, threads),)) for n in range(threads)]
+        for saver in savers:
+            saver.start()
+        for saver in savers:
+            saver.join()
+        # Wait for everyone to finish, then check this worker sees all writes
+        barrier.wait()
+        vista.refresh()
+        seen = vista.get_dream_statistics()['total_dreams']
+    results.put((worker_id, saved, seen, len(vista.data['symbols']), reloads))
+    vista.close()
+
+
+def run(storage='journal', workers=4, dreams=200, compact_every=200, threads=1):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'stress.json')
+        open_vista(data_file, storage, compact_every).close()
+        
+        barrier = multiprocessing.Barrier(workers)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(
+            n, data_file, storage, dreams, compact_every, threads, barrier, results)) for n in range(workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        
+        vista = open_vista(data_file, storage, compact_every)
+        expected = sum(report[1] for report in reports)
+        stats = vista.get_dream_statistics()
+        failures = []
+        if stats['total_dreams'] != expected:
+            failures.append(f"{expected} dreams saved but {stats['total_dreams']} on disk")
+        expected_symbols = 20 + len(range(0, dreams, 10))
+        if len(vista.data['symbols']) != expected_symbols:
+            failures.append(f"expected {expected_symbols} symbols, found {len(vista.data['symbols'])}")
+        reloads = sum(report[4] for report in reports)
+        for worker_id, _, seen, symbols, _ in reports:
+            if seen != expected:
+                failures.append(f"worker {worker_id} sees {seen} of {expected} dreams")
+            if symbols != expected_symbols:
+                failures.append(f"worker {worker_id} sees {symbols} of {expected_symbols} symbols")
+        if not vista.store.indexed:
+            dream_ids = [d['id'] for d in vista.data['dreams']]
+            interp_ids = [i['id'] for i in vista.data['interpretations']]
+            if len(set(dream_ids)) != len(dream_ids):
+                failures.append("duplicate dream IDs")
+            if len(set(interp_ids)) != len(interp_ids):
+                failures.append("duplicate interpretation IDs")
+            known = set(dream_ids)
+            if any(i['dream_id'] not in known for i in vista.data['interpretations']):
+                failures.append("interpretations reference missing dreams")
+            with contextlib.redirect_stdout(io.StringIO()):
+                if not vista.verify_statistics():
+                    failures.append("statistics do not match a full recount")
+        vista.close()
+    
+    print(f"{storage}: {workers} workers x {threads} threads x {dreams} dreams, {expected} saved in {elapsed:.2f}s "
+          f"({expected / elapsed:.0f} dreams/s, {reloads} full reloads)")
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    return not failures
+
+
+def first_start_worker(worker_id, data_file, storage, barrier, results):
+    barrier.wait()
+    vista = open_vista(data_file, storage, 1000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        saved = bool(vista.analyze_dream(f"{DREAM_TEMPLATES[worker_id % len(DREAM_TEMPLATES)]} (worker {worker_id})"))
+    results.put(saved)
+    vista.close()
+
+
+def check_first_start(storage='journal', workers=4):
+    """Workers that all find no data file create it once between them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'stress.json')
+        barrier = multiprocessing.Barrier(workers)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=first_start_worker, args=(n, data_file, storage, barrier, results))
+                     for n in range(workers)]
+        for process in processes:
+            process.start()
+        saved = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        vista = open_vista(data_file, storage, 1000)
+        dreams = vista.get_dream_statistics()['total_dreams']
+        symbols = len(vista.data['symbols'])
+        vista.close()
+    failures = []
+    if dreams != saved:
+        failures.append(f"{saved} first dreams saved but {dreams} on disk")
+    if symbols != 20:
+        failures.append(f"expected 20 initial symbols, found {symbols}")
+    print(f"{storage}: {workers} workers creating the data file together, {dreams} of {saved} first dreams kept")
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    return not failures
+
+
+def check_torn_journal(compact_every=1000):
+    """A torn last line and a corrupt line must not take later records with them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'stress.json')
+        journal_file = data_file + '.journal'
+        first = open_vista(data_file, 'journal', compact_every)
+        second = open_vista(data_file, 'journal', compact_every)
+        with contextlib.redirect_stdout(io.StringIO()):
+            first.analyze_dream(DREAM_TEMPLATES[0])
+            # A worker that crashed halfway through writing a record
+            with open(journal_file, 'ab') as f:
+                f.write(b'{"seq": 999, "op": "dream", "data": {"id"')
+            second.analyze_dream(DREAM_TEMPLATES[1])
+            # A line that was complete but got damaged on disk
+            with open(journal_file, 'ab') as f:
+                f.write(b'{"seq": \x00\x00\n')
+            second.analyze_dream(DREAM_TEMPLATES[2])
+            first.refresh()
+            seen = first.get_dream_statistics()['total_dreams']
+            first.close()
+            second.close()
+            reloaded = open_vista(data_file, 'journal', compact_every)
+            kept = reloaded.get_dream_statistics()['total_dreams']
+            reloaded.close()
+    failures = []
+    if seen != 3:
+        failures.append(f"the first store sees {seen} of 3 dreams after the torn write")
+    if kept != 3:
+        failures.append(f"{kept} of 3 dreams left after reloading")
+    print(f"journal: torn and corrupt journal lines, {kept} of 3 dreams kept")
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--storage', choices=['journal', 'sqlite'], default='journal')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dreams', type=int, default=200)
+    parser.add_argument('--compact-every', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1, help="saving threads per worker")
+    args = parser.parse_args()
+    ok = run(args.storage, args.workers, args.dreams, args.compact_every, args.threads)
+    ok = check_first_start(args.storage, args.workers) and ok
+    if args.storage == 'journal':
+        ok = check_torn_journal() and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,213 @@
+"""Reproducible benchmark suite for DreamVista.
+
+For every scale a synthetic dataset is generated and written in the
+dream_vista_data.json format by one process, then a fresh process loads it
+and times the main DreamVista operations, so the peak RSS it reports is
+DreamVista's alone, not the generator's. analyze_dream is timed both
+without saving (matching only) and with saving, which includes the write
+to disk. Results go to a JSON file; pass --compare with an earlier file to
+see how each operation moved.
+
+    python -m benchmarks.suite --scales 1000 100000 1000000 --out bench_results.json
+    python -m benchmarks.suite --scales 1000 --compare bench_results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from dreamvista import DreamVista
+from benchmarks.common import percentile
+from benchmarks.corpus import dream_text, generate_dataset, write_dataset
+
+DEFAULT_SCALES = [1000, 100000, 1000000]
+REGRESSION_THRESHOLD = 1.2
+
+# operation -> number of timed calls
+CALLS = {
+    'load_data': 3,
+    'save_data': 3,
+    'analyze_dream': 200,
+    # Each save rewrites the whole JSON file with the default storage
+    'analyze_dream_save': 10,
+    'get_dream_statistics': 200,
+    'search_dreams_by_symbol': 200,
+    'add_custom_symbol': 5,
+}
+
+
+def summarize(latencies_ms):
+    total = sum(latencies_ms) / 1000
+    return {
+        'calls': len(latencies_ms),
+        'total_s': round(total, 6),
+        'throughput_per_s': round(len(latencies_ms) / total, 3) if total else None,
+        'p50_ms': round(percentile(latencies_ms, 50), 4),
+        'p95_ms': round(percentile(latencies_ms, 95), 4),
+        'p99_ms': round(percentile(latencies_ms, 99), 4),
+        'max_ms': round(max(latencies_ms), 4),
+    }
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+def prepare_scale(directory, dreams, storage, symbols, interpretations_per_dream, text_length, seed):
+    """Write one scale's dataset into `directory`; runs in a process of its own"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = os.path.join(directory, 'dream_vista_data.json')
+        data = generate_dataset(symbols, dreams, interpretations_per_dream, text_length, seed=seed)
+        dataset = {'catalog': data['symbols'], 'interpretations': len(data['interpretations'])}
+        write_dataset(path, data)
+        dataset['dataset_bytes'] = os.path.getsize(path)
+        del data
+        if storage == 'sqlite':
+            DreamVista(path, storage='sqlite').close()
+            from storage import migrate_json_to_sqlite
+            migrate_json_to_sqlite(path, os.path.splitext(path)[0] + '.db')
+    return dataset
+
+
+def run_scale(directory, dreams, storage, dataset, text_length, seed):
+    """Benchmark one prepared dataset; runs in a fresh process"""
+    rng = random.Random(seed)
+    catalog = dataset['catalog']
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = os.path.join(directory, 'dream_vista_data.json')
+        
+        vista = DreamVista(path, storage=storage)
+        results['load_data'] = [timed(vista.load_data) for _ in range(CALLS['load_data'])]
+        results['save_data'] = [timed(vista.save_data) for _ in range(CALLS['save_data'])]
+        
+        texts = [dream_text(rng, [s['symbol'] for s in rng.sample(catalog, 2)], text_length)
+                 for _ in range(CALLS['analyze_dream'])]
+        results['analyze_dream'] = [timed(vista.analyze_dream, text, save_dream=False) for text in texts]
+        results['analyze_dream_save'] = [timed(vista.analyze_dream, text)
+                                         for text in texts[:CALLS['analyze_dream_save']]]
+        results['get_dream_statistics'] = [timed(vista.get_dream_statistics)
+                                           for _ in range(CALLS['get_dream_statistics'])]
+        results['search_dreams_by_symbol'] = [
+            timed(vista.search_dreams_by_symbol, rng.choice(catalog)['symbol'], limit=20)
+            for _ in range(CALLS['search_dreams_by_symbol'])]
+        results['add_custom_symbol'] = [
+            timed(vista.add_custom_symbol, f'benchmark symbol {i}', 'benchmark', 'neutral', 'test', f'benchkw{i}')
+            for i in range(CALLS['add_custom_symbol'])]
+        vista.close()
+    
+    return {
+        'dreams': dreams,
+        'symbols': len(catalog),
+        'interpretations': dataset['interpretations'],
+        'storage': storage,
+        'dataset_bytes': dataset['dataset_bytes'],
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'operations': {name: summarize(latencies) for name, latencies in results.items()},
+    }
+
+
+def _child(queue, func, args):
+    queue.put(func(*args))
+
+
+def in_new_process(context, func, *args):
+    """Return func(*args), run in a fresh process"""
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(queue, func, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current, threshold=REGRESSION_THRESHOLD):
+    """Print p50 changes per operation; return the number of regressions"""
+    regressions = 0
+    before = {(r['dreams'], r['storage']): r for r in previous['results']}
+    for result in current['results']:
+        old = before.get((result['dreams'], result['storage']))
+        if not old:
+            continue
+        print(f"\n{result['dreams']:,} dreams ({result['storage']}): "
+              f"peak RSS {old['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+        for name, stats in result['operations'].items():
+            if name not in old['operations']:
+                continue
+            was = old['operations'][name]['p50_ms']
+            ratio = stats['p50_ms'] / was if was else float('inf')
+            flag = '  REGRESSION' if ratio > threshold else ''
+            regressions += bool(flag)
+            print(f"  {name:<24} p50 {was:>10.3f} -> {stats['p50_ms']:>10.3f} ms ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Dream Vista benchmark suite")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="numbers of dreams")
+    parser.add_argument('--storage', choices=['json', 'journal', 'sqlite'], default='json')
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--interpretations-per-dream', type=float, default=2.0)
+    parser.add_argument('--text-length', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': [],
+    }
+    context = multiprocessing.get_context('spawn')
+    for dreams in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset = in_new_process(context, prepare_scale, tmp, dreams, args.storage, args.symbols,
+                                     args.interpretations_per_dream, args.text_length, args.seed)
+            result = in_new_process(context, run_scale, tmp, dreams, args.storage, dataset,
+                                    args.text_length, args.seed)
+        report['results'].append(result)
+        print(f"{dreams:>9,} dreams  peak RSS {result['peak_rss_mb']:>8.1f} MB")
+        for name, stats in result['operations'].items():
+            print(f"    {name:<24} p50 {stats['p50_ms']:>10.3f}  p99 {stats['p99_ms']:>10.3f} ms  "
+                  f"{stats['throughput_per_s'] or 0:>10.1f}/s")
+    
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.out}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(previous, report):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,419 @@
+import argparse
+import contextlib
+import csv
+import gc
+import hashlib
 import json
 import os
+import sys
+import threading
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from symbol_matcher import SymbolMatcher, tokenize
+from symbol_index import SymbolNameIndex
+from aggregates import DreamAggregates, GRANULARITIES, SCORINGS
+from result_cache import LRUCache
+from records import DreamRecord, column, compact_data, day_ordinal
+from metrics import MetricsRegistry, SIZE_BUCKETS
+from text_index import TextIndex, parse_query
+from partitions import DreamPartitions
+from storage import (JsonFileStore, JournalStore, SharedJournalStore, SqliteStore, WriteBehindStore,
+                     migrate_json_to_sqlite)
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Disable the cyclic garbage collector for the duration of the block"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# Batches with at least this many dreams are matched in a process pool
+POOL_MIN_DREAMS = 2000
+POOL_CHUNK_SIZE = 500
+# Per-item error of analyze_dreams when the batch write failed
+SAVE_ERROR = "the dream could not be saved"
+
+_worker_matcher = None
+
+
+def _init_match_worker(symbols):
+    global _worker_matcher
+    _worker_matcher = SymbolMatcher(symbols)
+
+
+def _match_chunk(texts):
+    """Match dreams in a pool worker; positions are sent back instead of symbol dicts"""
+    return [_worker_matcher.match_positions(text) for text in texts]
+
 
 class DreamVista:
-    def __init__(self, data_file='dream_vista_data.json'):
+    def __init__(self, data_file='dream_vista_data.json', storage='json', compact_every=1000, shared=False,
+                 write_behind=False, flush_interval=1.0, flush_records=100, cache_size=1024, cache_ttl=3600,
+                 snapshot=False, partitions=False, max_partitions=8, catalog=None, index_text=False):
+        if storage == 'sqlite' and data_file.endswith('.json'):
+            data_file = os.path.splitext(data_file)[0] + '.db'
         self.data_file = data_file
+        if shared and storage == 'json':
+            raise ValueError("Shared mode needs 'journal' or 'sqlite' storage")
+        if snapshot and storage == 'sqlite':
+            raise ValueError("Binary snapshots need 'json' or 'journal' storage")
+        if partitions and storage == 'sqlite':
+            # SQLite already keeps dreams out of memory and answers queries from its indexes
+            raise ValueError("Per-user partitions need 'json' or 'journal' storage")
+        if storage == 'json':
+            self.store = JsonFileStore(data_file, snapshot=snapshot)
+        elif storage == 'journal' and shared:
+            self.store = SharedJournalStore(data_file, compact_every=compact_every, snapshot=snapshot)
+        elif storage == 'journal':
+            self.store = JournalStore(data_file, compact_every=compact_every, snapshot=snapshot)
+        elif storage == 'sqlite':
+            self.store = SqliteStore(data_file)
+        else:
+            raise ValueError(f"Unknown storage mode: {storage}")
+        if write_behind:
+            # Queued writes would be invisible to other processes allocating IDs
+            if shared or storage == 'sqlite':
+                raise ValueError("Write-behind needs single-process 'json' or 'journal' storage")
+            self.store = WriteBehindStore(self.store, flush_interval=flush_interval,
+                                          flush_records=flush_records)
+        self.write_behind = write_behind
+        # Partitions hold one user's dreams and take their symbols from the catalog
+        self.catalog = catalog or self
+        self.partitions = None
+        if partitions:
+            options = dict(storage=storage, compact_every=compact_every, shared=shared,
+                           write_behind=write_behind, flush_interval=flush_interval,
+                           flush_records=flush_records, snapshot=snapshot, index_text=index_text)
+            self.partitions = DreamPartitions(
+                self, lambda path: DreamVista(data_file=path, catalog=self, **options), max_partitions)
         self.data = {
             'symbols': [],
             'dreams': [],
             'interpretations': []
         }
+        # Matching results keyed by (normalized text, catalog_version)
+        self.match_cache = LRUCache(cache_size, cache_ttl)
+        self.catalog_version = 0
+        # Bumped by every change to the dreams or symbols, so answers can be
+        # recognised as current (see data_tag). Versions are counted per
+        # instance, and instance_id tells apart those of other instances.
+        self.data_version = 0
+        self.instance_id = os.urandom(8).hex()
+        # Full-text index, built by the first search_dreams call, or after
+        # every load in a background thread with index_text
+        self.index_text = index_text
+        self.text_index = None
+        self._text_index_lock = threading.Lock()
+        self._text_index_build_lock = threading.Lock()
+        if self.catalog is not self:
+            # Partitions report through the catalog's /metrics
+            self.metrics = self.catalog.metrics
+            self.stage_seconds = self.catalog.stage_seconds
+            self.save_bytes = self.catalog.save_bytes
+        else:
+            self.metrics = MetricsRegistry()
+            self.stage_seconds = self.metrics.histogram(
+                'dream_vista_stage_seconds', 'Time spent in each DreamVista processing stage', ['stage'])
+            self.save_bytes = self.metrics.histogram(
+                'dream_vista_save_bytes', 'Bytes written to disk per save', ['operation'], buckets=SIZE_BUCKETS)
         self.load_data()
         
     def load_data(self):
         """Load data from JSON file"""
+        # Loading creates millions of objects that all stay alive; pausing the
+        # cyclic garbage collector saves it rescanning them while they are built
+        with gc_paused():
+            try:
+                if self.store.exists():
+                    self.data = self.store.load()
+                    print("✓ Data loaded successfully")
+                elif self.catalog is not self:
+                    # A new user's partition; its file is created by the first save
+                    self.data = {'symbols': [], 'dreams': [], 'interpretations': []}
+                else:
+                    with self.store.lock():
+                        # Another worker may have created it since the check above
+                        if self.store.exists():
+                            self.data = self.store.load()
+                            print("✓ Data loaded successfully")
+                        else:
+                            print("✓ Creating new data file")
+                            self.populate_initial_symbols()
+                            self.save_data()
+            except Exception as e:
+                print(f"✗ Error loading data: {e}")
+                self.populate_initial_symbols()
+            compact_data(self.data)
+            self.init_id_counters()
+            self.build_indexes()
+    
+    def build_indexes(self):
+        """Build the in-memory lookup structures from self.data"""
+        self.data_version += 1
+        if self.catalog is self:
+            self.catalog_version += 1
+            self.symbols_by_id = {s['id']: s for s in self.data['symbols']}
+            self.symbols_by_name = {}
+            for s in self.data['symbols']:
+                self.symbols_by_name.setdefault(s['symbol'].lower(), s)
+            self.symbol_index = SymbolNameIndex(self.data['symbols'])
+            self.matcher = SymbolMatcher(self.data['symbols'])
+        self.aggregates = DreamAggregates.from_data(self.data, self.catalog.symbols_by_id)
+        
+        self.dreams_by_id = {dream.id: dream for dream in self.data['dreams']}
+        with self._text_index_lock:
+            self.text_index = None
+        if self.index_text and not self.store.indexed:
+            threading.Thread(target=self.get_text_index, name='dreamvista-text-index', daemon=True).start()
+        
+        # Rank all dreams by _posting_key once (newest ID first, then a stable
+        # sort by creation time) so the posting lists sort on plain ints
+        sort_time = {dream_id: dream.sort_time for dream_id, dream in self.dreams_by_id.items()}
+        order = sorted(sort_time, reverse=True)
+        order.sort(key=sort_time.__getitem__)
+        rank = {dream_id: position for position, dream_id in enumerate(order)}
+        
+        # symbol_id -> IDs of dreams interpreted with it, oldest first
+        self.dream_postings = {}
+        interpretations = self.data['interpretations']
+        for symbol_id, dream_id in zip(column(interpretations, 'symbol_id'), column(interpretations, 'dream_id')):
+            self.dream_postings.setdefault(symbol_id, set()).add(dream_id)
+        for symbol_id, dream_ids in self.dream_postings.items():
+            self.dream_postings[symbol_id] = sorted(dream_ids & rank.keys(), key=rank.__getitem__)
+    
+    def apply_record(self, op, payload):
+        """Add a new dream, interpretation batch or symbol to memory and the indexes"""
+        next_ids = self.data['next_ids']
+        self.data_version += 1
+        if op == 'symbol':
+            self.data['symbols'].append(payload)
+            self.symbols_by_id[payload['id']] = payload
+            self.symbols_by_name.setdefault(payload['symbol'].lower(), payload)
+            self.symbol_index.add_symbol(payload)
+            self.matcher.add_symbol(payload)
+            self.catalog_version += 1
+            next_ids['symbols'] = max(next_ids['symbols'], payload['id'] + 1)
+        elif op == 'dream':
+            if not self.store.indexed:
+                dream = DreamRecord.from_dict(payload)
+                self.data['dreams'].append(dream)
+                self.dreams_by_id[dream.id] = dream
+                with self._text_index_lock:
+                    if self.text_index is not None:
+                        self.text_index.add(dream.id, dream.dream_text)
+                self.aggregates.add_dream(dream.day)
+            next_ids['dreams'] = max(next_ids['dreams'], payload['id'] + 1)
+        elif op == 'interpretations':
+            for interp in payload:
+                if not self.store.indexed:
+                    self.data['interpretations'].append(interp)
+                    dream = self.dreams_by_id.get(interp['dream_id'])
+                    self.aggregates.add_interpretation(self.catalog.symbols_by_id.get(interp['symbol_id']),
+                                                       dream.day if dream else None)
+                    self._add_posting(interp['symbol_id'], interp['dream_id'])
+                next_ids['interpretations'] = max(next_ids['interpretations'], interp['id'] + 1)
+            if not self.store.indexed:
+                for _, group in groupby(payload, key=itemgetter('dream_id')):
+                    self.aggregates.cooccurrence.add_dream_symbols([interp['symbol_id'] for interp in group])
+        elif op == 'next_ids':
+            for collection, next_id in payload.items():
+                next_ids[collection] = max(next_ids[collection], next_id)
+        else:
+            raise ValueError(f"Unknown record type: {op}")
+    
+    def refresh(self):
+        """Pick up records other worker processes have written since the last call"""
+        if self.catalog is not self:
+            self.catalog.refresh()
+        # Apply the records before another thread can allocate IDs without them
+        with self.store.local_lock():
+            for op, payload in self.store.changes():
+                if op == 'reload':
+                    self.load_data()
+                    return
+                self.apply_record(op, payload)
+    
+    def _posting_key(self, dream_id):
+        """Sort key for posting lists: creation time, then newest ID first on ties"""
+        return (self.dreams_by_id[dream_id].sort_time, -dream_id)
+    
+    def _add_posting(self, symbol_id, dream_id):
+        """Add a dream to a symbol's posting list, keeping it sorted"""
+        if dream_id not in self.dreams_by_id:
+            return
+        postings = self.dream_postings.setdefault(symbol_id, [])
+        position = bisect_left(postings, self._posting_key(dream_id), key=self._posting_key)
+        if position == len(postings) or postings[position] != dream_id:
+            postings.insert(position, dream_id)
+    
+    def save_data(self):
+        """Save data to JSON file (queued in write-behind mode)"""
+        try:
+            bytes_before = self.store.bytes_written
+            # json.dump streams into the file, so this covers serialization and the write
+            with self.stage_seconds.time('save_data'):
+                self.store.save(self.data)
+            self.observe_bytes('save_data', bytes_before)
+            return True
+        except Exception as e:
+            print(f"✗ Error saving data: {e}")
+            return False
+    
+    def flush(self):
+        """Wait until every queued write has reached the disk"""
+        if self.partitions is not None:
+            self.partitions.flush()
+        self.store.flush()
+    
+    def close(self):
+        """Release the storage backend, draining any queued writes"""
+        if self.partitions is not None:
+            self.partitions.close()
+        self.store.close()
+    
+    @contextlib.contextmanager
+    def for_user(self, user):
+        """The DreamVista holding `user`'s dreams, kept loaded for the duration of the block.
+        
+        That is this instance for user None, and a partition sharing this
+        instance's symbols otherwise (see partitions.py).
+        """
+        if user is None:
+            yield self
+            return
+        if self.partitions is None:
+            raise ValueError("Per-user dreams need partitions=True")
+        partition = self.partitions.acquire(user)
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    self.data = json.load(f)
-                print("✓ Data loaded successfully")
+            yield partition
+        finally:
+            self.partitions.release(user)
+    
+    def version_key(self):
+        """The store's version when all processes sharing it agree on one, else this instance's own"""
+        version = self.store.version()
+        if version is None:
+            return (self.instance_id, self.data_version)
+        return version
+    
+    def data_tag(self, all_users=False):
+        """A short string that changes whenever the data behind this instance's answers does.
+        
+        It covers this instance's dreams and the symbol catalog, and with
+        `all_users` every user's partition too. Equal tags mean a cached
+        answer is still current. With shared storage every worker computes
+        the same tag for the same data; otherwise tags are per instance.
+        """
+        self.refresh()
+        parts = [self.version_key(), self.catalog.version_key()]
+        if all_users and self.partitions is not None:
+            parts.append(self.partitions.version_key())
+        return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    
+    def catalog_tag(self):
+        """Like data_tag, but only changes when a symbol is added"""
+        self.refresh()
+        catalog = self.catalog
+        if catalog.store.version() is None:
+            return f"{catalog.instance_id}-{catalog.catalog_version}"
+        # Symbols are only ever added, so every worker agrees on these
+        symbols = catalog.data['symbols']
+        return f"{len(symbols)}-{symbols[-1]['id'] if symbols else 0}"
+    
+    def list_symbols(self):
+        """Every symbol of the catalog, in the order they were added"""
+        self.refresh()
+        return list(self.catalog.data['symbols'])
+    
+    def persistence_stats(self):
+        """Write queue depth, flush latency and bytes written"""
+        return self.store.stats()
+    
+    def observe_bytes(self, operation, bytes_before):
+        """Record how many bytes a save wrote"""
+        written = self.store.bytes_written - bytes_before
+        # Write-behind saves land later on the writer thread; SQLite reports no bytes
+        if written > 0 and not self.write_behind:
+            self.save_bytes.observe(written, operation)
+    
+    def dataset_sizes(self):
+        """Record counts per collection and the size of the data files on disk, user partitions included"""
+        if self.store.indexed:
+            sizes = self.store.row_counts()
+        else:
+            sizes = {collection: len(self.data[collection])
+                     for collection in ('symbols', 'dreams', 'interpretations')}
+        sizes['file_bytes'] = sum(os.path.getsize(path) for path in
+                                  (self.data_file, self.data_file + '.journal', self.data_file + '.snap',
+                                   self.data_file + '-wal')
+                                  if os.path.exists(path))
+        if self.partitions is not None:
+            for key, value in self.partitions.dataset_sizes().items():
+                sizes[key] += value
+        return sizes
+    
+    def metrics_text(self):
+        """Current metrics in the Prometheus text format"""
+        self.refresh()
+        sizes = self.dataset_sizes()
+        records = self.metrics.gauge('dream_vista_dataset_records', 'Records per collection', ['collection'])
+        for collection in ('symbols', 'dreams', 'interpretations'):
+            records.set(sizes[collection], collection)
+        self.metrics.gauge('dream_vista_data_file_bytes', 'Size of the data files on disk').set(
+            sizes['file_bytes'])
+        
+        for key, value in self.persistence_stats().items():
+            if key == 'bytes_written':
+                self.metrics.counter('dream_vista_bytes_written_total',
+                                     'Bytes written by the storage backend').set(value)
             else:
-                print("✓ Creating new data file")
-                self.populate_initial_symbols()
-                self.save_data()
+                self.metrics.gauge(f'dream_vista_persistence_{key}', f'Storage backend {key}').set(value)
+        
+        cache = self.cache_stats()
+        for key in ('hits', 'misses', 'evictions', 'expirations'):
+            self.metrics.counter(f'dream_vista_match_cache_{key}_total',
+                                 f'Matching cache {key}').set(cache[key])
+        for key in ('size', 'maxsize'):
+            self.metrics.gauge(f'dream_vista_match_cache_{key}', f'Matching cache {key}').set(cache[key])
+        
+        if self.partitions is not None:
+            partitions = self.partitions.stats()
+            for key in ('loaded', 'max_loaded'):
+                self.metrics.gauge(f'dream_vista_partitions_{key}', f'User partitions {key}').set(partitions[key])
+            for key in ('loads', 'evictions'):
+                self.metrics.counter(f'dream_vista_partition_{key}_total',
+                                     f'User partition {key}').set(partitions[key])
+        return self.metrics.render()
+    
+    def record(self, op, payload):
+        """Persist one new dream, interpretation batch or symbol"""
+        try:
+            bytes_before = self.store.bytes_written
+            # With json storage this is the full rewrite of the data file
+            with self.stage_seconds.time('write'):
+                self.store.append(self.data, op, payload)
+            self.observe_bytes(op, bytes_before)
+            return True
         except Exception as e:
-            print(f"✗ Error loading data: {e}")
-            self.populate_initial_symbols()
+            print(f"✗ Error saving data: {e}")
+            return False
     
-    def save_data(self):
-        """Save data to JSON file"""
+    def record_many(self, records):
+        """Persist several (op, payload) records in one write"""
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=2, default=str)
+            bytes_before = self.store.bytes_written
+            with self.stage_seconds.time('write'):
+                self.store.append_many(self.data, records)
+            self.observe_bytes('batch', bytes_before)
             return True
         except Exception as e:
             print(f"✗ Error saving data: {e}")
@@ -206,36 +587,31 @@ class DreamVista:
         self.data['symbols'] = symbols
         print("✓ Initial dream symbols populated")
     
+    def init_id_counters(self):
+        """Set up the per-collection ID counters kept in data['next_ids']"""
+        next_ids = self.data.setdefault('next_ids', {})
+        for collection in ('symbols', 'dreams', 'interpretations'):
+            # Journal replay can leave the stored counter behind the records
+            highest = max(column(self.data[collection], 'id'), default=0)
+            next_ids[collection] = max(next_ids.get(collection, 1), highest + 1)
+    
+    def reserve_ids(self, collection, count):
+        """Reserve a block of consecutive IDs and return the first one"""
+        next_ids = self.data['next_ids']
+        first_id = next_ids[collection]
+        next_ids[collection] = first_id + count
+        return first_id
+    
     def get_next_id(self, collection):
         """Get next available ID for a collection"""
-        if not self.data[collection]:
-            return 1
-        return max(item['id'] for item in self.data[collection]) + 1
+        return self.reserve_ids(collection, 1)
     
     def analyze_dream(self, dream_text, save_dream=True):
         """Analyze dream text and find matching symbols"""
-        dream_text_lower = dream_text.lower()
-        matched_symbols = []
-        
-        for symbol in self.data['symbols']:
-            # Check symbol name
-            if symbol['symbol'].lower() in dream_text_lower:
-                matched_symbols.append({
-                    'symbol': symbol,
-                    'relevance': 10
-                })
-                continue
-            
-            # Check keywords
-            if symbol['keywords']:
-                keywords = [kw.strip() for kw in symbol['keywords'].split(',')]
-                for keyword in keywords:
-                    if keyword.lower() in dream_text_lower:
-                        matched_symbols.append({
-                            'symbol': symbol,
-                            'relevance': 7
-                        })
-                        break
+        self.refresh()
+        with self.stage_seconds.time('match'):
+            matches = self.match_symbols(dream_text)
+        matched_symbols = [{'symbol': symbol, 'relevance': relevance} for symbol, relevance in matches]
         
         # Save dream if requested
         dream_id = None
@@ -246,20 +622,163 @@ class DreamVista:
         
         return matched_symbols
     
+    def analyze_dreams(self, dreams, save_dreams=True, workers=None):
+        """Analyze many dreams and save them with a single write.
+        
+        `dreams` yields dream texts or dicts with 'dream_text' and optional
+        'dream_date', 'created_at', 'mood_before' and 'recurring'. Returns one
+        {'dream_id', 'matched_symbols'} dict per item, with an 'error' for
+        items that could not be read, or SAVE_ERROR and no dream_id if
+        the write failed. Batches of POOL_MIN_DREAMS or more are
+        matched in a pool of `workers` processes (default: one per CPU).
+        """
+        self.refresh()
+        entries = []
+        results = []
+        for item in dreams:
+            result = {'dream_id': None, 'matched_symbols': []}
+            try:
+                entries.append((self.dream_entry(item), result))
+            except (TypeError, ValueError) as e:
+                result['error'] = str(e)
+            results.append(result)
+        
+        with self.stage_seconds.time('match_batch'):
+            matches = self.match_many([entry['dream_text'] for entry, _ in entries], workers)
+        for (entry, result), dream_matches in zip(entries, matches):
+            result['matched_symbols'] = [{'symbol': symbol, 'relevance': relevance}
+                                         for symbol, relevance in dream_matches]
+        
+        if save_dreams:
+            # Like analyze_dream, only dreams with at least one symbol are saved
+            batch = [(entry, result) for entry, result in entries if result['matched_symbols']]
+            if not self.save_batch(batch):
+                for _, result in batch:
+                    result['error'] = SAVE_ERROR
+        return results
+    
+    def dream_entry(self, item):
+        """Check one batch item and fill in the dream fields it leaves out"""
+        if isinstance(item, str):
+            item = {'dream_text': item}
+        if not isinstance(item, dict):
+            raise TypeError("a dream must be a text or an object")
+        dream_text = item.get('dream_text', item.get('dream'))
+        if not isinstance(dream_text, str) or not dream_text.strip():
+            raise ValueError("dream_text is missing")
+        
+        now = datetime.now()
+        dream_date = item.get('dream_date') or now.strftime('%Y-%m-%d')
+        datetime.strptime(dream_date, '%Y-%m-%d')
+        # Imported journal entries are dated by their dream_date
+        created_at = item.get('created_at') or (
+            f'{dream_date} 00:00:00' if item.get('dream_date') else now.strftime('%Y-%m-%d %H:%M:%S'))
+        datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
+        
+        mood_before = item.get('mood_before') or None
+        if mood_before is not None and not isinstance(mood_before, str):
+            raise ValueError("mood_before must be a text")
+        recurring = item.get('recurring', False)
+        if isinstance(recurring, str):
+            recurring = recurring.strip().lower() in ('1', 'true', 'yes', 'y')
+        return {
+            'dream_text': dream_text,
+            'dream_date': dream_date,
+            'mood_before': mood_before,
+            'recurring': bool(recurring),
+            'created_at': created_at
+        }
+    
+    def match_many(self, texts, workers=None):
+        """(symbol, relevance) pairs for each text, in a process pool for big batches.
+        
+        The match cache is bypassed so a bulk import does not evict the
+        entries interactive requests rely on.
+        """
+        if len(texts) < POOL_MIN_DREAMS or workers == 1:
+            return [self.catalog.matcher.match(text) for text in texts]
+        symbols = list(self.catalog.matcher.symbols)
+        chunks = [texts[start:start + POOL_CHUNK_SIZE] for start in range(0, len(texts), POOL_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker,
+                                 initargs=(symbols,)) as pool:
+            return [[(symbols[position], relevance) for position, relevance in positions]
+                    for chunk in pool.map(_match_chunk, chunks) for positions in chunk]
+    
+    def save_batch(self, entries):
+        """Save (entry, result) pairs with one ID reservation per collection and one write.
+        
+        Each result gets its dream_id once the write has succeeded. If it
+        fails, the data is reloaded so the unsaved dreams and their reserved
+        IDs are dropped again, and False is returned.
+        """
+        if not entries:
+            return True
+        dream_ids = []
+        try:
+            with self.stage_seconds.time('save_batch'), self.store.lock():
+                self.refresh()
+                first_dream_id = self.reserve_ids('dreams', len(entries))
+                interpretation_id = self.reserve_ids(
+                    'interpretations', sum(len(result['matched_symbols']) for _, result in entries))
+                records = []
+                interpretations = []
+                for offset, (entry, result) in enumerate(entries):
+                    dream = dict(entry, id=first_dream_id + offset)
+                    self.apply_record('dream', dream)
+                    records.append(('dream', dream))
+                    for match in result['matched_symbols']:
+                        interpretations.append({
+                            'id': interpretation_id,
+                            'dream_id': dream['id'],
+                            'symbol_id': match['symbol']['id'],
+                            'relevance_score': match['relevance']
+                        })
+                        interpretation_id += 1
+                    dream_ids.append(dream['id'])
+                self.apply_record('interpretations', interpretations)
+                records.append(('interpretations', interpretations))
+                if not self.record_many(records):
+                    raise OSError("the batch was not written")
+        except Exception as e:
+            print(f"✗ Error saving dreams: {e}")
+            self.load_data()
+            return False
+        for (_, result), dream_id in zip(entries, dream_ids):
+            result['dream_id'] = dream_id
+        return True
+    
+    def match_symbols(self, dream_text):
+        """Return (symbol, relevance) pairs for a dream, using the result cache"""
+        # The matcher only sees the lowercased words, so texts that differ in
+        # case, spacing or punctuation share a cache entry
+        normalized = ' '.join(tokenize(dream_text))
+        key = (normalized, self.catalog.catalog_version)
+        matches = self.catalog.match_cache.get(key)
+        if matches is None:
+            matches = self.catalog.matcher.match(normalized)
+            self.catalog.match_cache.put(key, matches)
+        return matches
+    
+    def cache_stats(self):
+        """Hit, miss and eviction counters of the matching cache"""
+        return self.catalog.match_cache.stats()
+    
     def save_dream(self, dream_text, mood_before=None, recurring=False):
         """Save user's dream"""
         try:
-            dream_id = self.get_next_id('dreams')
-            dream = {
-                'id': dream_id,
-                'dream_text': dream_text,
-                'dream_date': datetime.now().strftime('%Y-%m-%d'),
-                'mood_before': mood_before,
-                'recurring': recurring,
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            self.data['dreams'].append(dream)
-            self.save_data()
+            with self.stage_seconds.time('save_dream'), self.store.lock():
+                self.refresh()
+                dream_id = self.get_next_id('dreams')
+                dream = {
+                    'id': dream_id,
+                    'dream_text': dream_text,
+                    'dream_date': datetime.now().strftime('%Y-%m-%d'),
+                    'mood_before': mood_before,
+                    'recurring': recurring,
+                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+                self.apply_record('dream', dream)
+                self.record('dream', dream)
             return dream_id
         except Exception as e:
             print(f"✗ Error saving dream: {e}")
@@ -268,101 +787,297 @@ class DreamVista:
     def save_interpretations(self, dream_id, matched_symbols):
         """Save dream-symbol relationships"""
         try:
-            for match in matched_symbols:
-                interpretation = {
-                    'id': self.get_next_id('interpretations'),
+            with self.stage_seconds.time('save_interpretations'), self.store.lock():
+                self.refresh()
+                first_id = self.reserve_ids('interpretations', len(matched_symbols))
+                interpretations = [{
+                    'id': first_id + offset,
                     'dream_id': dream_id,
                     'symbol_id': match['symbol']['id'],
                     'relevance_score': match['relevance']
-                }
-                self.data['interpretations'].append(interpretation)
-            self.save_data()
+                } for offset, match in enumerate(matched_symbols)]
+                self.apply_record('interpretations', interpretations)
+                self.record('interpretations', interpretations)
         except Exception as e:
             print(f"✗ Error saving interpretations: {e}")
     
     def add_custom_symbol(self, symbol, meaning, emotional_tone, category, keywords):
         """Add new dream symbol"""
+        if self.catalog is not self:
+            # Symbols are shared by all users
+            return self.catalog.add_custom_symbol(symbol, meaning, emotional_tone, category, keywords)
         try:
-            # Check if symbol already exists
-            if any(s['symbol'].lower() == symbol.lower() for s in self.data['symbols']):
-                print(f"✗ Symbol '{symbol}' already exists")
-                return False
-            
-            new_symbol = {
-                'id': self.get_next_id('symbols'),
-                'symbol': symbol,
-                'meaning': meaning,
-                'emotional_tone': emotional_tone,
-                'category': category,
-                'keywords': keywords
-            }
-            self.data['symbols'].append(new_symbol)
-            self.save_data()
+            with self.store.lock():
+                self.refresh()
+                # Check if symbol already exists
+                if symbol.lower() in self.symbols_by_name:
+                    print(f"✗ Symbol '{symbol}' already exists")
+                    return False
+                similar = self.similar_symbols(symbol)
+                if similar:
+                    names = ', '.join(f"'{s['symbol']}'" for s in similar)
+                    print(f"⚠ Symbol '{symbol}' is close to existing symbols: {names}")
+                
+                new_symbol = {
+                    'id': self.get_next_id('symbols'),
+                    'symbol': symbol,
+                    'meaning': meaning,
+                    'emotional_tone': emotional_tone,
+                    'category': category,
+                    'keywords': keywords
+                }
+                self.apply_record('symbol', new_symbol)
+                self.record('symbol', new_symbol)
             print(f"✓ Symbol '{symbol}' added successfully")
             return True
         except Exception as e:
             print(f"✗ Error adding symbol: {e}")
             return False
     
-    def get_dream_statistics(self):
-        """Get statistics about saved dreams"""
+    def get_dream_statistics(self, date_from=None, date_to=None, granularity=None, all_users=False):
+        """Get statistics about saved dreams.
+        
+        With `date_from`/`date_to` (YYYY-MM-DD, inclusive) the statistics
+        cover dreams dated in that range, and with a granularity ('day',
+        'week' or 'month') they include a per-period 'trend'. Both are
+        answered from the daily rollups. With partitions, `all_users` adds
+        up this instance's dreams and every user's partition summary.
+        """
         try:
-            total_dreams = len(self.data['dreams'])
-            
-            # Most common symbols
-            symbol_counts = Counter()
-            for interp in self.data['interpretations']:
-                symbol = next((s for s in self.data['symbols'] if s['id'] == interp['symbol_id']), None)
-                if symbol:
-                    symbol_counts[symbol['symbol']] += 1
-            
-            common_symbols = [{'symbol': sym, 'frequency': count} 
-                            for sym, count in symbol_counts.most_common(5)]
-            
-            # Emotional tone distribution
-            tone_counts = Counter()
-            for interp in self.data['interpretations']:
-                symbol = next((s for s in self.data['symbols'] if s['id'] == interp['symbol_id']), None)
-                if symbol:
-                    tone_counts[symbol['emotional_tone']] += 1
-            
-            emotional_tones = [{'emotional_tone': tone, 'count': count}
-                             for tone, count in tone_counts.items()]
-            
-            return {
-                'total_dreams': total_dreams,
-                'common_symbols': common_symbols,
-                'emotional_tones': emotional_tones
-            }
+            self.refresh()
+            with self.stage_seconds.time('statistics'):
+                aggregates = self.aggregates
+                if all_users and self.partitions is not None:
+                    aggregates = self.partitions.total_aggregates()
+                
+                if date_from or date_to or granularity:
+                    if granularity and granularity not in GRANULARITIES:
+                        raise ValueError(f"Unknown granularity: {granularity}")
+                    first, last = (None if value is None else day_ordinal(value) for value in (date_from, date_to))
+                    if (date_from and first is None) or (date_to and last is None):
+                        raise ValueError("Dates must be YYYY-MM-DD")
+                    if self.store.indexed:
+                        rollups = self.store.daily_rollups(date_from, date_to)
+                    else:
+                        rollups = aggregates.rollups
+                    return rollups.summarize(self.catalog.symbols_by_id, first, last, granularity)
+                
+                if self.store.indexed:
+                    return self.store.get_dream_statistics()
+                
+                total_dreams = aggregates.total_dreams
+                
+                # Most common symbols
+                common_symbols = [{'symbol': self.catalog.symbols_by_id[symbol_id]['symbol'], 'frequency': count}
+                                  for symbol_id, count in aggregates.top_symbols(5)]
+                
+                # Emotional tone distribution
+                emotional_tones = [{'emotional_tone': tone, 'count': count}
+                                   for tone, count in aggregates.tone_counts.items()]
+                
+                return {
+                    'total_dreams': total_dreams,
+                    'common_symbols': common_symbols,
+                    'emotional_tones': emotional_tones
+                }
         except Exception as e:
             print(f"✗ Error getting statistics: {e}")
             return None
     
-    def search_dreams_by_symbol(self, symbol_name):
-        """Find all dreams containing a specific symbol"""
+    def verify_statistics(self):
+        """Recompute the statistics from scratch and compare with the running counters"""
+        if self.store.indexed:
+            # The backend computes statistics from its tables on every call
+            return True
+        expected = DreamAggregates.from_data(self.data, self.catalog.symbols_by_id)
+        problems = self.aggregates.differences(expected)
+        for problem in problems:
+            print(f"✗ Statistics mismatch: {problem}")
+        return not problems
+    
+    def related_symbols(self, symbol_ids, k=3, scoring='lift'):
+        """Symbols most often seen in the same dreams as each of symbol_ids.
+        
+        Returns {symbol_id: [{'symbol', 'dreams', 'score'}, ...]}, scored by
+        lift or PMI ('pmi') from the co-occurrence counts.
+        """
+        try:
+            if scoring not in SCORINGS:
+                raise ValueError(f"Unknown scoring: {scoring}")
+            self.refresh()
+            with self.stage_seconds.time('related'):
+                cooccurrence = self._cooccurrence(symbol_ids)
+                return {symbol_id: [{'symbol': self.catalog.symbols_by_id[other]['symbol'], 'dreams': count,
+                                     'score': round(score, 2)}
+                                    for other, count, score in cooccurrence.related(symbol_id, k, scoring)
+                                    if other in self.catalog.symbols_by_id]
+                        for symbol_id in symbol_ids}
+        except Exception as e:
+            print(f"✗ Error finding related symbols: {e}")
+            return {}
+    
+    def symbol_associations(self, k=10, scoring='lift', all_users=False):
+        """The k pairs of symbols that appear together most strongly, over every user's dreams with all_users"""
+        try:
+            if scoring not in SCORINGS:
+                raise ValueError(f"Unknown scoring: {scoring}")
+            self.refresh()
+            with self.stage_seconds.time('related'):
+                symbols_by_id = self.catalog.symbols_by_id
+                if all_users and self.partitions is not None:
+                    cooccurrence = self.partitions.total_aggregates().cooccurrence
+                else:
+                    cooccurrence = self._cooccurrence()
+                return [{'symbol': symbols_by_id[a]['symbol'], 'other': symbols_by_id[b]['symbol'],
+                         'dreams': count, 'score': round(score, 2)}
+                        for a, b, count, score in cooccurrence.top_pairs(k, scoring)
+                        if a in symbols_by_id and b in symbols_by_id]
+        except Exception as e:
+            print(f"✗ Error finding symbol associations: {e}")
+            return []
+    
+    def _cooccurrence(self, symbol_ids=None):
+        if self.store.indexed:
+            return self.store.cooccurrence(symbol_ids)
+        return self.aggregates.cooccurrence
+    
+    def rebuild_rollups(self):
+        """Regenerate the daily rollups from the saved dreams; returns the number of days"""
+        with self.store.lock():
+            self.refresh()
+            if self.store.indexed:
+                return self.store.rebuild_rollups()
+            self.aggregates = DreamAggregates.from_data(self.data, self.catalog.symbols_by_id)
+            return len(self.aggregates.rollups.days)
+    
+    def find_symbol(self, name):
+        """The symbol called `name`, else the first with `name` as a keyword, or None"""
+        symbol = self.catalog.symbols_by_name.get(name.lower())
+        if symbol is None:
+            symbols = self.catalog.symbol_index.lookup(name)
+            symbol = symbols[0] if symbols else None
+        return symbol
+    
+    def similar_symbols(self, name, limit=5):
+        """Existing symbols whose name or a keyword is within a few typos of `name`"""
         try:
-            symbol = next((s for s in self.data['symbols'] 
-                          if s['symbol'].lower() == symbol_name.lower()), None)
-            if not symbol:
+            self.refresh()
+            return [symbol for symbol, _, _ in self.catalog.symbol_index.similar(name, limit)
+                    if symbol['symbol'].lower() != name.lower()]
+        except Exception as e:
+            print(f"✗ Error finding similar symbols: {e}")
+            return []
+    
+    def suggest_symbols(self, name, limit=5):
+        """'Did you mean' symbol names for a name that is not a symbol, closest only"""
+        try:
+            self.refresh()
+            if self.find_symbol(name):
                 return []
-            
-            # Find interpretations with this symbol
-            dream_ids = [i['dream_id'] for i in self.data['interpretations'] 
-                        if i['symbol_id'] == symbol['id']]
-            
-            # Get dreams
-            dreams = [d for d in self.data['dreams'] if d['id'] in dream_ids]
-            
-            # Add symbol info to each dream
-            for dream in dreams:
-                dream['symbol'] = symbol['symbol']
-                dream['meaning'] = symbol['meaning']
-            
-            return sorted(dreams, key=lambda x: x['created_at'], reverse=True)
+            similar = self.catalog.symbol_index.similar(name, limit)
+            return [symbol['symbol'] for symbol, distance, _ in similar if distance == similar[0][1]]
+        except Exception as e:
+            print(f"✗ Error finding similar symbols: {e}")
+            return []
+    
+    def search_dreams_by_symbol(self, symbol_name, offset=0, limit=None):
+        """Find dreams containing a specific symbol, named or by one of its keywords, newest first"""
+        try:
+            self.refresh()
+            with self.stage_seconds.time('search'):
+                symbol = self.find_symbol(symbol_name)
+                if not symbol:
+                    return []
+                
+                if self.store.indexed:
+                    dreams = self.store.search_dreams_by_symbol(symbol['id'], offset, limit)
+                    return [dict(dream, symbol=symbol['symbol'], meaning=symbol['meaning']) for dream in dreams]
+                
+                # Walk the posting list backwards so the newest dreams come first
+                postings = self.dream_postings.get(symbol['id'], [])
+                end = len(postings) - offset
+                start = 0 if limit is None else max(end - limit, 0)
+                
+                # Plain dicts for the templates, carrying the symbol info
+                return [self.dreams_by_id[dream_id].to_dict(symbol=symbol['symbol'], meaning=symbol['meaning'])
+                        for dream_id in reversed(postings[start:max(end, 0)])]
+        except Exception as e:
+            print(f"✗ Error searching dreams: {e}")
+            return []
+    
+    def search_dreams(self, query, offset=0, limit=None):
+        """Full-text search over dream texts, best BM25 match first.
+        
+        Every word of the query must occur in the dream and every quoted
+        phrase in order; symbol:NAME keeps only dreams interpreted with that
+        symbol. A query of filters only lists the matching dreams newest
+        first. Returns dream dicts with a 'score'.
+        """
+        try:
+            self.refresh()
+            with self.stage_seconds.time('text_search'):
+                words, phrases, symbol_names = parse_query(query)
+                symbol_ids = []
+                for name in symbol_names:
+                    symbol = self.find_symbol(name)
+                    if not symbol:
+                        return []
+                    symbol_ids.append(symbol['id'])
+                if not words and not symbol_ids:
+                    return []
+                
+                if self.store.indexed:
+                    return self.store.search_dreams(words, phrases, symbol_ids, offset, limit)
+                
+                end = None if limit is None else offset + limit
+                if not words:
+                    # Newest first, the order of search_dreams_by_symbol
+                    others = [set(self.dream_postings.get(symbol_id, ())) for symbol_id in symbol_ids[1:]]
+                    dream_ids = [dream_id for dream_id in reversed(self.dream_postings.get(symbol_ids[0], []))
+                                 if all(dream_id in other for other in others)]
+                    return [self.dreams_by_id[dream_id].to_dict(score=0.0) for dream_id in dream_ids[offset:end]]
+                
+                allowed = None
+                if symbol_ids:
+                    allowed = set.intersection(*(set(self.dream_postings.get(symbol_id, ()))
+                                                 for symbol_id in symbol_ids))
+                hits = self.get_text_index().search(words, phrases, allowed,
+                                                    lambda dream_id: self.dreams_by_id[dream_id].dream_text,
+                                                    offset, limit)
+                return [self.dreams_by_id[dream_id].to_dict(score=round(score, 3)) for score, dream_id in hits]
         except Exception as e:
             print(f"✗ Error searching dreams: {e}")
             return []
     
+    def get_text_index(self):
+        """The full-text index, built from all loaded dreams on first use.
+        
+        The build runs outside _text_index_lock so saves are not held up;
+        dreams saved meanwhile are indexed before the index is published,
+        and apply_record adds later ones.
+        """
+        with self._text_index_build_lock:
+            text_index = self.text_index
+            if text_index is not None:
+                return text_index
+            # No gc_paused() here: the build usually runs in a background
+            # thread, and the collector is process-wide
+            with self.stage_seconds.time('text_index_build'):
+                while True:
+                    dreams = self.data['dreams']
+                    text_index = TextIndex()
+                    while True:
+                        with self._text_index_lock:
+                            if self.data['dreams'] is not dreams:
+                                # Reloaded meanwhile; start again
+                                break
+                            if len(text_index) == len(dreams):
+                                self.text_index = text_index
+                                return text_index
+                            batch = dreams[len(text_index):]
+                        for dream in batch:
+                            text_index.add(dream.id, dream.dream_text)
+    
     def display_interpretation(self, matched_symbols):
         """Display dream interpretation results"""
         if not matched_symbols:
@@ -454,5 +1169,99 @@ def main_menu():
             print("Invalid choice. Please try again.")
 
 
+def read_dreams(f, file_format):
+    """Yield dream dicts from a JSONL or CSV stream; unreadable JSONL lines are reported and skipped"""
+    if file_format == 'csv':
+        yield from csv.DictReader(f)
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            print(f"✗ Skipping line {line_number}: {e}")
+
+
+def import_dreams(app, f, file_format, batch_size=5000, workers=None):
+    """Analyze and save every dream in a stream, one batch (and one write) at a time"""
+    totals = {'read': 0, 'saved': 0, 'unmatched': 0, 'invalid': 0}
+    batch = []
+    
+    def run_batch():
+        for result in app.analyze_dreams(batch, workers=workers):
+            totals['read'] += 1
+            if 'error' in result:
+                totals['invalid'] += 1
+                print(f"✗ Skipping dream {totals['read']}: {result['error']}")
+            elif result['dream_id']:
+                totals['saved'] += 1
+            else:
+                totals['unmatched'] += 1
+        batch.clear()
+    
+    for item in read_dreams(f, file_format):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            run_batch()
+    if batch:
+        run_batch()
+    return totals
+
+
+def main(argv=None):
+    """Command-line entry point; runs the interactive menu without a command"""
+    parser = argparse.ArgumentParser(description="Dream Vista dream interpretation")
+    commands = parser.add_subparsers(dest='command')
+    
+    migrate = commands.add_parser('migrate-sqlite', help="copy the JSON data file into an SQLite database")
+    migrate.add_argument('--from', dest='json_file', default='dream_vista_data.json')
+    migrate.add_argument('--to', dest='db_file', default='dream_vista_data.db')
+    
+    rebuild = commands.add_parser('rebuild-rollups', help="regenerate the daily statistics rollups (only SQLite stores them; "
+                                   "JSON storage rebuilds them at every start)")
+    rebuild.add_argument('--data-file', default='dream_vista_data.json')
+    rebuild.add_argument('--storage', choices=['json', 'journal', 'sqlite'], default='json')
+    
+    importer = commands.add_parser('import', help="analyze and save dreams from a JSONL or CSV file")
+    importer.add_argument('file', nargs='?', default='-', help="input file, or - for stdin (default)")
+    importer.add_argument('--format', choices=['jsonl', 'csv'],
+                          help="input format (default: from the file extension, jsonl for stdin)")
+    importer.add_argument('--batch-size', type=int, default=5000, help="dreams saved per write")
+    importer.add_argument('--workers', type=int, help="matching processes for large batches (default: CPUs)")
+    importer.add_argument('--data-file', default='dream_vista_data.json')
+    importer.add_argument('--storage', choices=['json', 'journal', 'sqlite'], default='json')
+    importer.add_argument('--user', help="save the dreams in this user's partition")
+    
+    args = parser.parse_args(argv)
+    if args.command == 'migrate-sqlite':
+        counts = migrate_json_to_sqlite(args.json_file, args.db_file)
+        print(f"✓ Migrated {counts['symbols']} symbols, {counts['dreams']} dreams and "
+              f"{counts['interpretations']} interpretations to {args.db_file}")
+    elif args.command == 'rebuild-rollups':
+        app = DreamVista(data_file=args.data_file, storage=args.storage)
+        try:
+            days = app.rebuild_rollups()
+        finally:
+            app.close()
+        print(f"✓ Rebuilt rollups for {days} days")
+    elif args.command == 'import':
+        file_format = args.format or ('csv' if args.file.lower().endswith('.csv') else 'jsonl')
+        app = DreamVista(data_file=args.data_file, storage=args.storage, partitions=args.user is not None)
+        try:
+            with app.for_user(args.user) as vista:
+                if args.file == '-':
+                    totals = import_dreams(vista, sys.stdin, file_format, args.batch_size, args.workers)
+                else:
+                    with open(args.file, newline='', encoding='utf-8') as f:
+                        totals = import_dreams(vista, f, file_format, args.batch_size, args.workers)
+        finally:
+            app.close()
+        print(f"✓ Imported {totals['saved']} of {totals['read']} dreams "
+              f"({totals['unmatched']} without symbols, {totals['invalid']} invalid)")
+    else:
+        main_menu()
+
+
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Per-user dream journals, loaded on demand and evicted when idle"""
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+from urllib.parse import quote, unquote
+
+from aggregates import DreamAggregates
+from snapshot import source_key
+from storage import write_json_atomic
+
+
+def files_key(path):
+    """Identifies the current version of a partition's data and journal files"""
+    return [source_key(name) if os.path.exists(name) else None for name in (path, path + '.journal')]
+
+
+def read_summary(path):
+    """Load a summary file, turning the keys JSON made strings back into IDs and day numbers"""
+    with open(path) as f:
+        summary = json.load(f)
+    for field in ('symbol_counts', 'symbol_dreams'):
+        summary[field] = {int(key): count for key, count in summary[field].items()}
+    summary['days'] = {int(day): [dreams, {int(key): count for key, count in counts.items()}]
+                       for day, (dreams, counts) in summary['days'].items()}
+    summary['pairs'] = {int(a): {int(b): count for b, count in others.items()}
+                        for a, others in summary['pairs'].items()}
+    return summary
+
+
+class DreamPartitions:
+    """One DreamVista per user, all sharing the symbol catalog of a main DreamVista.
+    
+    Each user's dreams and interpretations live in their own data file in
+    `<data file>.users/`, named after the URL-quoted user key, so a request
+    loads and rewrites only that user's history. Partitions are loaded
+    when first acquired and kept in LRU order; once more than `max_loaded`
+    are in memory, the least recently used one that no caller holds is
+    closed. Closing writes `<partition file>.summary` with the partition's
+    totals and daily rollups, which is all the global statistics need. A
+    summary is trusted while the partition's files are unchanged on disk;
+    otherwise the partition is loaded once to recompute it.
+    """
+    
+    def __init__(self, catalog, open_partition, max_loaded=8):
+        self.catalog = catalog
+        # data file -> DreamVista using the catalog's symbols
+        self.open_partition = open_partition
+        self.max_loaded = max_loaded
+        base, self.extension = os.path.splitext(catalog.data_file)
+        self.directory = base + '.users'
+        os.makedirs(self.directory, exist_ok=True)
+        # user -> DreamVista, least recently used first
+        self.loaded = OrderedDict()
+        self.in_use = Counter()
+        # user -> (files_key, summary) of partitions that are not loaded
+        self.summaries = {}
+        self.loads = 0
+        self.evictions = 0
+        # Partitions are loaded while holding the lock, so two requests for
+        # the same user never load it twice
+        self._lock = threading.RLock()
+    
+    def __len__(self):
+        return len(self.loaded)
+    
+    def partition_file(self, user):
+        if not isinstance(user, str) or not user.strip():
+            raise ValueError("A user key must be a non-empty string")
+        return os.path.join(self.directory, quote(user, safe='') + self.extension)
+    
+    def users(self):
+        """Keys of every user with saved dreams, or loaded now"""
+        users = set(self.loaded)
+        for name in os.listdir(self.directory):
+            for suffix in (self.extension, self.extension + '.journal'):
+                if name.endswith(suffix):
+                    users.add(unquote(name[:-len(suffix)]))
+        return sorted(users)
+    
+    def acquire(self, user):
+        """Return the user's partition, loading it if needed; release() it when done"""
+        path = self.partition_file(user)
+        with self._lock:
+            partition = self.loaded.get(user)
+            if partition is None:
+                partition = self.open_partition(path)
+                self.loaded[user] = partition
+                self.summaries.pop(user, None)
+                self.loads += 1
+            self.loaded.move_to_end(user)
+            self.in_use[user] += 1
+            self._evict()
+            return partition
+    
+    def release(self, user):
+        with self._lock:
+            self.in_use[user] -= 1
+            if self.in_use[user] <= 0:
+                del self.in_use[user]
+            self._evict()
+    
+    def _evict(self):
+        """Close least recently used partitions nobody holds until at most max_loaded remain"""
+        idle = [user for user in self.loaded if user not in self.in_use]
+        for user in idle[:max(len(self.loaded) - self.max_loaded, 0)]:
+            self._close(user, self.loaded.pop(user))
+            self.evictions += 1
+    
+    def _close(self, user, partition):
+        partition.close()
+        self._write_summary(user, partition)
+    
+    def _write_summary(self, user, partition):
+        """Store the summary of a partition whose writes have all reached the disk"""
+        path = self.partition_file(user)
+        key = files_key(path)
+        if key == [None, None]:
+            # Nothing was ever saved for this user
+            return
+        summary = partition.aggregates.summary()
+        try:
+            write_json_atomic(path + '.summary', dict(summary, files=key), indent=None)
+        except OSError as e:
+            print(f"✗ Error writing partition summary: {e}")
+        self.summaries[user] = (key, summary)
+    
+    def summary(self, user):
+        """The user's DreamAggregates.summary(), loading the partition only if its summary is stale"""
+        path = self.partition_file(user)
+        with self._lock:
+            partition = self.loaded.get(user)
+            if partition is not None:
+                partition.refresh()
+                return partition.aggregates.summary()
+            key = files_key(path)
+            cached = self.summaries.get(user)
+            if cached and cached[0] == key:
+                return cached[1]
+            try:
+                summary = read_summary(path + '.summary')
+                if summary.pop('files') == key:
+                    self.summaries[user] = (key, summary)
+                    return summary
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+            
+            # Missing or stale summary: recompute it from the partition
+            partition = self.acquire(user)
+            try:
+                partition.flush()
+                self._write_summary(user, partition)
+                return partition.aggregates.summary()
+            finally:
+                self.release(user)
+    
+    def total_aggregates(self):
+        """DreamAggregates over the catalog's own dreams and every user's, from the summaries"""
+        symbols_by_id = self.catalog.symbols_by_id
+        totals = DreamAggregates()
+        totals.add_summary(self.catalog.aggregates.summary(), symbols_by_id)
+        for user in self.users():
+            totals.add_summary(self.summary(user), symbols_by_id)
+        return totals
+    
+    def version_key(self):
+        """Changes whenever any user's dreams do: the data_version of loaded
+        partitions and the files of the others"""
+        with self._lock:
+            key = []
+            for user in self.users():
+                partition = self.loaded.get(user)
+                if partition is not None:
+                    partition.refresh()
+                    key.append((user, partition.version_key()))
+                else:
+                    key.append((user, files_key(self.partition_file(user))))
+            return key
+    
+    def dataset_sizes(self):
+        """Dreams, interpretations and file bytes over every user's partition.
+        
+        Loaded partitions are counted directly and the others from their
+        summaries, which only count interpretations of catalog symbols.
+        """
+        sizes = Counter()
+        with self._lock:
+            for user in self.users():
+                partition = self.loaded.get(user)
+                if partition is not None:
+                    sizes['dreams'] += len(partition.data['dreams'])
+                    sizes['interpretations'] += len(partition.data['interpretations'])
+                else:
+                    summary = self.summary(user)
+                    sizes['dreams'] += summary['total_dreams']
+                    sizes['interpretations'] += sum(summary['symbol_counts'].values())
+        for name in os.listdir(self.directory):
+            try:
+                sizes['file_bytes'] += os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                # Replaced or removed meanwhile
+                pass
+        return sizes
+    
+    def flush(self):
+        with self._lock:
+            for partition in self.loaded.values():
+                partition.flush()
+    
+    def close(self):
+        """Close every loaded partition, writing its summary"""
+        with self._lock:
+            while self.loaded:
+                user, partition = self.loaded.popitem(last=False)
+                self._close(user, partition)
+    
+    def stats(self):
+        return {
+            'loaded': len(self.loaded),
+            'max_loaded': self.max_loaded,
+            'loads': self.loads,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,246 @@
+"""Compact in-memory forms of dreams and interpretations.
+
+JSON loading produces one dict per row. Loaded data is converted by
+compact_data(): dreams become DreamRecord objects (__slots__, integer
+timestamps) and interpretations an InterpretationTable of parallel integer
+arrays. Both still answer row['field'] lookups, so code written against
+the dict rows keeps working, and json_default() turns them back into
+plain JSON.
+"""
+from array import array
+from datetime import date, datetime
+
+DREAM_FIELDS = ('id', 'dream_text', 'dream_date', 'mood_before', 'recurring', 'created_at')
+INTERPRETATION_FIELDS = ('id', 'dream_id', 'symbol_id', 'relevance_score')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Stored in DreamRecord._date when dream_date is the day of created_at
+_CREATED_DAY = object()
+
+
+def parse_timestamp(value):
+    """Seconds since 0001-01-01 for a 'YYYY-MM-DD HH:MM:SS' string, else None"""
+    if not isinstance(value, str) or len(value) != 19 or value[10] != ' ':
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return moment.toordinal() * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def day_ordinal(value):
+    """Day number (date.toordinal) of a 'YYYY-MM-DD' string, else None"""
+    if not isinstance(value, str) or len(value) != 10:
+        return None
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return None
+
+
+def format_timestamp(seconds):
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f'{date.fromordinal(days).isoformat()} {hours:02d}:{minutes:02d}:{seconds:02d}'
+
+
+class DreamRecord:
+    """One saved dream.
+    
+    created_at is kept as integer seconds and dream_date is only stored
+    when it differs from the day of created_at; values in any other format
+    are kept verbatim. Item access (dream['created_at'], dream.get(...),
+    dict(dream)) gives the same values as the original dict row.
+    """
+    
+    __slots__ = ('id', 'dream_text', 'mood_before', 'recurring', '_created', '_date')
+    
+    def __init__(self, id, dream_text, dream_date, mood_before, recurring, created_at):
+        self.id = id
+        self.dream_text = dream_text
+        self.mood_before = mood_before
+        self.recurring = recurring
+        seconds = parse_timestamp(created_at)
+        self._created = created_at if seconds is None else seconds
+        if seconds is not None and dream_date == created_at[:10]:
+            self._date = _CREATED_DAY
+        else:
+            self._date = dream_date
+    
+    @classmethod
+    def from_dict(cls, row):
+        return cls(row['id'], row.get('dream_text'), row.get('dream_date'), row.get('mood_before'),
+                   row.get('recurring'), row.get('created_at'))
+    
+    @property
+    def created_at(self):
+        if isinstance(self._created, int):
+            return format_timestamp(self._created)
+        return self._created
+    
+    @property
+    def dream_date(self):
+        if self._date is _CREATED_DAY:
+            return date.fromordinal(self._created // 86400).isoformat()
+        return self._date
+    
+    @property
+    def day(self):
+        """dream_date as a day number, or None if it is not a date"""
+        if self._date is _CREATED_DAY:
+            return self._created // 86400
+        return day_ordinal(self._date)
+    
+    @property
+    def sort_time(self):
+        """created_at as comparable seconds; unparseable values sort as oldest"""
+        return self._created if isinstance(self._created, int) else -1
+    
+    def keys(self):
+        return DREAM_FIELDS
+    
+    def __getitem__(self, key):
+        if key not in DREAM_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key) if key in DREAM_FIELDS else default
+    
+    def __eq__(self, other):
+        if isinstance(other, (DreamRecord, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f'DreamRecord({self.to_dict()!r})'
+    
+    def to_dict(self, **extra):
+        """A plain dict of the fields, with the text read if it is still lazy"""
+        row = {
+            'id': self.id,
+            'dream_text': str(self.dream_text) if self.dream_text is not None else None,
+            'dream_date': self.dream_date,
+            'mood_before': self.mood_before,
+            'recurring': self.recurring,
+            'created_at': self.created_at
+        }
+        row.update(extra)
+        return row
+    
+    to_json = to_dict
+
+
+class InterpretationTable:
+    """Interpretation rows as four parallel arrays of 64-bit integers.
+    
+    Behaves like a list of row dicts: len(), iteration and indexing build
+    the dicts on the fly, append() and extend() take them. Code that only
+    needs one field reads the column arrays directly.
+    """
+    
+    def __init__(self, ids=(), dream_ids=(), symbol_ids=(), relevance_scores=()):
+        self.ids = array('q', ids)
+        self.dream_ids = array('q', dream_ids)
+        self.symbol_ids = array('q', symbol_ids)
+        self.relevance_scores = array('q', relevance_scores)
+    
+    @classmethod
+    def from_columns(cls, ids, dream_ids, symbol_ids, relevance_scores):
+        """Wrap existing 'q' arrays without copying them"""
+        table = cls()
+        table.ids, table.dream_ids, table.symbol_ids, table.relevance_scores = (
+            ids, dream_ids, symbol_ids, relevance_scores)
+        return table
+    
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        return cls(*([row[field] for row in rows] for field in INTERPRETATION_FIELDS))
+    
+    def column(self, field):
+        return getattr(self, field + 's')
+    
+    def copy(self):
+        return InterpretationTable(self.ids, self.dream_ids, self.symbol_ids, self.relevance_scores)
+    
+    def append(self, row):
+        # Fill relevance_scores last: rows below its length are complete
+        self.ids.append(row['id'])
+        self.dream_ids.append(row['dream_id'])
+        self.symbol_ids.append(row['symbol_id'])
+        self.relevance_scores.append(row['relevance_score'])
+    
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+    
+    def __len__(self):
+        return len(self.relevance_scores)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        return {'id': self.ids[index], 'dream_id': self.dream_ids[index],
+                'symbol_id': self.symbol_ids[index], 'relevance_score': self.relevance_scores[index]}
+    
+    def __iter__(self):
+        # zip() stops at the shortest column, so a row still being appended is skipped
+        for interp_id, dream_id, symbol_id, relevance_score in zip(
+                self.ids, self.dream_ids, self.symbol_ids, self.relevance_scores):
+            yield {'id': interp_id, 'dream_id': dream_id, 'symbol_id': symbol_id,
+                   'relevance_score': relevance_score}
+    
+    def __eq__(self, other):
+        if isinstance(other, (InterpretationTable, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def to_json(self):
+        return list(self)
+
+
+def dream_day(dream):
+    """Day number of a dream's dream_date, for DreamRecords and dict rows alike"""
+    if isinstance(dream, DreamRecord):
+        return dream.day
+    return day_ordinal(dream.get('dream_date'))
+
+
+def column(rows, field):
+    """Values of one field across rows: the array of a table, else a generator"""
+    if isinstance(rows, InterpretationTable):
+        return rows.column(field)
+    return (row[field] for row in rows)
+
+
+def compact_data(data):
+    """Convert freshly loaded dreams and interpretations in place.
+    
+    Dream keys other than DREAM_FIELDS are dropped; older versions of
+    search_dreams_by_symbol leaked 'symbol' and 'meaning' into stored dreams.
+    """
+    dreams = data.get('dreams', [])
+    for position, dream in enumerate(dreams):
+        if not isinstance(dream, DreamRecord):
+            dreams[position] = DreamRecord.from_dict(dream)
+    interpretations = data.get('interpretations', [])
+    if not isinstance(interpretations, InterpretationTable):
+        try:
+            data['interpretations'] = InterpretationTable.from_rows(interpretations)
+        except (TypeError, OverflowError):
+            # Non-integer values cannot go into the arrays; keep the dicts
+            pass
+    return data
+
+
+def json_default(value):
+    """JSON encoder hook: plain forms of the compact rows, str() for anything else"""
+    to_json = getattr(value, 'to_json', None)
+    return to_json() if to_json else str(value)
@@ -0,0 +1,166 @@
+"""Binary snapshot of a DreamVista dataset for fast startup.
+
+The snapshot is written next to the JSON data file and holds the same
+data: small top-level values (symbols, next_ids, ...) as JSON, dream and
+interpretation IDs as packed integer arrays, the remaining dream fields as
+JSON columns and every dream_text concatenated into one UTF-8 blob. On load
+the file is memory-mapped and everything except the dream texts is decoded
+eagerly; each dream's text is a LazyText that slices the mapping when it is
+first needed.
+
+Layout: magic, sections, header JSON, then the header offset as a
+little-endian u64 in the last 8 bytes.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from records import INTERPRETATION_FIELDS, DreamRecord, InterpretationTable, column
+
+MAGIC = b'DVSNAP01'
+FORMAT_VERSION = 1
+# Dream fields stored as JSON columns; id and dream_text have their own sections
+JSON_DREAM_FIELDS = ('dream_date', 'mood_before', 'recurring', 'created_at')
+
+
+def source_key(path):
+    """Identifies one version of the JSON file the snapshot was made from"""
+    stat = os.stat(path)
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+class LazyText:
+    """A dream_text that is read from the snapshot on demand.
+    
+    str() gives the text; it compares equal to the same text as a str.
+    """
+    
+    __slots__ = ('_texts', '_index')
+    
+    def __init__(self, texts, index):
+        self._texts = texts
+        self._index = index
+    
+    def __str__(self):
+        return self._texts.get(self._index)
+    
+    def __repr__(self):
+        return repr(str(self))
+    
+    def __eq__(self, other):
+        if isinstance(other, (str, LazyText)):
+            return str(self) == str(other)
+        return NotImplemented
+    
+    def __hash__(self):
+        return hash(str(self))
+
+
+class SnapshotTexts:
+    """Dream texts stored back to back in a memory-mapped snapshot"""
+    
+    def __init__(self, mapping, base, offsets):
+        self.mapping = mapping
+        self.base = base
+        self.offsets = offsets
+    
+    def get(self, index):
+        start = self.base + self.offsets[index]
+        end = self.base + self.offsets[index + 1]
+        return str(self.mapping[start:end], 'utf-8')
+
+
+def _int_array(values):
+    return array('q', values)
+
+
+def write_snapshot(f, data, source):
+    """Write `data` to the binary file `f`; returns the bytes written.
+    
+    `source` is the source_key() of the JSON file holding the same data.
+    Raises TypeError or OverflowError if an ID or score is not an integer.
+    """
+    sections = {}
+    
+    def add_section(name, payload):
+        sections[name] = [f.tell(), len(payload)]
+        f.write(payload)
+    
+    f.write(MAGIC)
+    dreams = data['dreams']
+    text_offsets = array('q', [0])
+    text_start = f.tell()
+    position = 0
+    for dream in dreams:
+        encoded = str(dream['dream_text']).encode('utf-8')
+        f.write(encoded)
+        position += len(encoded)
+        text_offsets.append(position)
+    sections['texts'] = [text_start, position]
+    add_section('text_offsets', text_offsets.tobytes())
+    add_section('dream_ids', _int_array(column(dreams, 'id')).tobytes())
+    add_section('dream_fields', json.dumps(
+        {field: [dream.get(field) for dream in dreams] for field in JSON_DREAM_FIELDS}, default=str).encode('utf-8'))
+    for field in INTERPRETATION_FIELDS:
+        add_section('interpretation_' + field, _int_array(column(data['interpretations'], field)).tobytes())
+    
+    header = {
+        'version': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'source': source,
+        'keys': list(data),
+        'top': {key: value for key, value in data.items() if key not in ('dreams', 'interpretations')},
+        'sections': sections,
+    }
+    header_offset = f.tell()
+    f.write(json.dumps(header, default=str).encode('utf-8'))
+    f.write(struct.pack('<Q', header_offset))
+    return f.tell()
+
+
+def read_snapshot(path, source):
+    """Load a snapshot, or return None if it is missing or not made from `source`"""
+    try:
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError: an empty file cannot be mapped
+        return None
+    if mapping[:len(MAGIC)] != MAGIC or len(mapping) < len(MAGIC) + 8:
+        mapping.close()
+        return None
+    try:
+        header_offset = struct.unpack('<Q', mapping[-8:])[0]
+        header = json.loads(mapping[header_offset:-8])
+        current = (header['version'] == FORMAT_VERSION and header['byteorder'] == sys.byteorder
+                   and header['source'] == source)
+    except (ValueError, KeyError, TypeError):
+        # Torn or foreign file
+        current = False
+    if not current:
+        mapping.close()
+        return None
+    
+    def section(name):
+        offset, length = header['sections'][name]
+        return mapping[offset:offset + length]
+    
+    def int_section(name):
+        values = array('q')
+        values.frombytes(section(name))
+        return values
+    
+    texts = SnapshotTexts(mapping, header['sections']['texts'][0], int_section('text_offsets'))
+    fields = json.loads(section('dream_fields'))
+    dreams = [DreamRecord(dream_id, LazyText(texts, index), dream_date, mood_before, recurring, created_at)
+              for index, (dream_id, dream_date, mood_before, recurring, created_at) in enumerate(zip(
+                  int_section('dream_ids'), *(fields[field] for field in JSON_DREAM_FIELDS)))]
+    interpretations = InterpretationTable.from_columns(
+        *(int_section('interpretation_' + field) for field in INTERPRETATION_FIELDS))
+    
+    collections = {'dreams': dreams, 'interpretations': interpretations}
+    # Same key order as the JSON file, so re-saving it gives the same output
+    return {key: collections[key] if key in collections else header['top'][key] for key in header['keys']}
@@ -0,0 +1,1067 @@
+"""Persistence backends for DreamVista data"""
+import atexit
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; only SharedJournalStore needs it
+    fcntl = None
+
+from aggregates import CoOccurrence, DailyRollups
+from records import InterpretationTable, day_ordinal, json_default
+from snapshot import read_snapshot, source_key, write_snapshot
+from text_index import content_stems
+
+
+def _file_mode(path):
+    """Permissions for a rewritten file: keep the old ones, else honour the umask"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def replace_atomic(path, write, mode='w'):
+    """Call write(f) on a temporary file, then rename it over `path`.
+    
+    A crash part-way through leaves the previous file intact instead of a
+    truncated one. Returns whatever `write` returns.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path), suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as f:
+            result = write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+        return result
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, indent=2):
+    """Atomically replace `path` with `data` as JSON; returns the bytes written"""
+    def write(f):
+        json.dump(data, f, indent=indent, default=json_default)
+        return f.tell()
+    return replace_atomic(path, write)
+
+
+def apply_record(data, op, payload):
+    """Apply one journaled mutation to an in-memory dataset"""
+    if op == 'dream':
+        data['dreams'].append(payload)
+    elif op == 'interpretations':
+        data['interpretations'].extend(payload)
+    elif op == 'symbol':
+        data['symbols'].append(payload)
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+class DreamStore:
+    """Interface implemented by DreamVista storage backends.
+    
+    File-based stores hand the whole dataset to DreamVista, which answers
+    queries from its in-memory indexes. Stores with `indexed = True` keep
+    dreams and interpretations to themselves and answer statistics and
+    search queries directly.
+    """
+    
+    indexed = False
+    bytes_written = 0
+    
+    def exists(self):
+        """Whether there is saved data to load"""
+        raise NotImplementedError
+    
+    def load(self):
+        """Return the saved dataset"""
+        raise NotImplementedError
+    
+    def save(self, data):
+        """Write the whole dataset"""
+        raise NotImplementedError
+    
+    def append(self, data, op, payload):
+        """Persist a mutation that has already been applied to `data`"""
+        raise NotImplementedError
+    
+    def append_many(self, data, records):
+        """Persist several (op, payload) mutations in one go"""
+        for op, payload in records:
+            self.append(data, op, payload)
+    
+    def flush(self):
+        """Block until every accepted write has reached the disk"""
+    
+    def stats(self):
+        """Counters describing the writes made so far"""
+        return {'queue_depth': 0, 'bytes_written': self.bytes_written}
+    
+    def lock(self):
+        """Context manager held while allocating IDs and writing"""
+        return contextlib.nullcontext()
+    
+    def local_lock(self):
+        """Context manager held while the records from changes() are applied.
+        
+        Threads of this process that write take it too (through lock()), so
+        none allocates IDs between changes() returning and the records
+        being applied.
+        """
+        return contextlib.nullcontext()
+    
+    def changes(self):
+        """Return (op, payload) records other processes wrote since the last call.
+        
+        An ('reload', None) record means the caller has fallen too far behind
+        and must load the whole dataset again.
+        """
+        return []
+    
+    def version(self):
+        """A value every process using these files agrees on once it has applied
+        all changes, and that moves with every write; None for single-process stores"""
+        return None
+    
+    def close(self):
+        pass
+
+
+class JsonFileStore(DreamStore):
+    """The whole dataset in one pretty-printed JSON file, rewritten on every change.
+    
+    With `snapshot=True` every write of the JSON file is followed by a
+    binary snapshot in `<data_file>.snap` (see snapshot.py). Loading uses
+    the snapshot while it still matches the JSON file, which skips parsing
+    the dream texts.
+    """
+    
+    def __init__(self, data_file, snapshot=False):
+        self.data_file = data_file
+        self.snapshot_file = data_file + '.snap' if snapshot else None
+    
+    def exists(self):
+        return os.path.exists(self.data_file)
+    
+    def load(self):
+        if self.snapshot_file:
+            data = read_snapshot(self.snapshot_file, source_key(self.data_file))
+            if data is not None:
+                return data
+        with open(self.data_file, 'r') as f:
+            data = json.load(f)
+        if self.snapshot_file:
+            # Missing or stale snapshot: make one so the next start is fast
+            self._write_snapshot(data)
+        return data
+    
+    def save(self, data):
+        self._write_data_file(data)
+    
+    def _write_data_file(self, data):
+        """Rewrite the JSON file, and the snapshot if enabled"""
+        self.bytes_written += write_json_atomic(self.data_file, data)
+        if self.snapshot_file:
+            self._write_snapshot(data)
+    
+    def _write_snapshot(self, data):
+        source = source_key(self.data_file)
+        try:
+            self.bytes_written += replace_atomic(
+                self.snapshot_file, lambda f: write_snapshot(f, data, source), mode='wb')
+        except (TypeError, OverflowError, OSError) as e:
+            # The JSON file is the source of truth; a stale snapshot is just ignored
+            print(f"✗ Error writing snapshot: {e}")
+    
+    def append(self, data, op, payload):
+        self.save(data)
+    
+    def append_many(self, data, records):
+        if records:
+            self.save(data)
+
+
+class JournalStore(JsonFileStore):
+    """A compacted JSON snapshot plus an append-only journal of newer records.
+    
+    Each new dream, interpretation batch or symbol is written as one JSON
+    line to `<data_file>.journal`. Every `compact_every` records the full
+    dataset is written to the snapshot and the journal is truncated. Journal
+    records carry a sequence number and the snapshot remembers the last one
+    it contains, so a crash between the two steps never replays a record
+    twice.
+    """
+    
+    def __init__(self, data_file, compact_every=1000, snapshot=False):
+        super().__init__(data_file, snapshot=snapshot)
+        self.journal_file = data_file + '.journal'
+        self.compact_every = compact_every
+        self.seq = 0
+        self.journal_records = 0
+    
+    def exists(self):
+        return super().exists() or os.path.exists(self.journal_file)
+    
+    def load(self):
+        if super().exists():
+            data = super().load()
+        else:
+            data = {'symbols': [], 'dreams': [], 'interpretations': []}
+        self.seq = data.pop('journal_seq', 0)
+        self.journal_records = 0
+        self._replay(data)
+        return data
+    
+    def save(self, data):
+        """Write a compacted snapshot and start a fresh journal"""
+        self._write_data_file(dict(data, journal_seq=self.seq))
+        with open(self.journal_file, 'w'):
+            pass
+        self.journal_records = 0
+    
+    def append(self, data, op, payload):
+        self.append_many(data, [(op, payload)])
+    
+    def append_many(self, data, records):
+        lines = []
+        for op, payload in records:
+            self.seq += 1
+            lines.append(json.dumps({'seq': self.seq, 'op': op, 'data': payload}, default=json_default) + '\n')
+        text = ''.join(lines)
+        self._trim_torn_tail()
+        with open(self.journal_file, 'a') as f:
+            f.write(text)
+        # json.dumps escapes non-ASCII, so characters are bytes here
+        self.bytes_written += len(text)
+        self.journal_records += len(lines)
+        if self.compact_every and self.journal_records >= self.compact_every:
+            self.save(data)
+    
+    def _replay(self, data):
+        """Apply journal records newer than the snapshot"""
+        if not os.path.exists(self.journal_file):
+            return
+        offset = 0
+        with open(self.journal_file, 'rb') as f:
+            for raw in f:
+                offset += len(raw)
+                record = self._parse_line(raw)
+                if record is None:
+                    # A bad line is skipped so the records after it survive
+                    if raw.endswith(b'\n'):
+                        print(f"⚠ Skipping unreadable journal line at byte {offset - len(raw)}")
+                    continue
+                if 'op' not in record or record['seq'] <= self.seq:
+                    # Compaction markers and records already in the snapshot
+                    continue
+                apply_record(data, record['op'], record['data'])
+                self.seq = record['seq']
+                self.journal_records += 1
+        # An unfinished last line is a torn write from a crash
+        self._trim_torn_tail()
+    
+    def _trim_torn_tail(self):
+        """Cut a partial last line left by a crashed writer.
+        
+        New records are appended after it otherwise, and the first of them
+        would be glued onto the broken line and lost with it.
+        """
+        try:
+            with open(self.journal_file, 'r+b') as f:
+                end = f.seek(0, os.SEEK_END)
+                if end == 0:
+                    return
+                f.seek(end - 1)
+                if f.read(1) == b'\n':
+                    return
+                position = end
+                while position > 0:
+                    start = max(0, position - 65536)
+                    f.seek(start)
+                    newline = f.read(position - start).rfind(b'\n')
+                    if newline >= 0:
+                        position = start + newline + 1
+                        break
+                    position = start
+                print(f"⚠ Removing {end - position} bytes of a torn journal write")
+                f.truncate(position)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def _parse_line(raw):
+        """The record on a journal line, or None if it is incomplete or corrupt"""
+        if not raw.endswith(b'\n'):
+            return None
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) and ('op' not in record or 'seq' in record) else None
+
+
+class SharedJournalStore(JournalStore):
+    """Journal storage that several worker processes can use at once.
+    
+    Writers hold an exclusive flock on `<data_file>.lock`, so ID allocation
+    and appends are serialized across processes. Each process remembers how
+    far into the journal it has read; a stat() of the journal tells it
+    whether anyone else has appended since, and only the new lines are
+    parsed. Compaction replaces the journal with a fresh file whose first
+    line is a marker holding a unique generation and the last sequence
+    number in the snapshot. A process that was behind finishes reading the
+    previous generation and carries on with the new one; only a process
+    that missed more than one compaction reloads the snapshot.
+    """
+    
+    def __init__(self, data_file, compact_every=1000, snapshot=False):
+        if fcntl is None:
+            raise ValueError("Shared journal storage needs POSIX file locks (fcntl)")
+        super().__init__(data_file, compact_every=compact_every, snapshot=snapshot)
+        self.lock_file = data_file + '.lock'
+        self.previous_journal_file = self.journal_file + '.prev'
+        self.journal_offset = 0
+        self.journal_stat = None
+        self.journal_generation = None
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd = None
+    
+    @contextlib.contextmanager
+    def lock(self):
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o666)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+    
+    def local_lock(self):
+        return self._thread_lock
+    
+    def version(self):
+        # Sequence numbers carry on across compactions; the generation sets
+        # apart journals that were started afresh
+        with self._thread_lock:
+            return ('journal', self.journal_generation, self.seq)
+    
+    def load(self):
+        with self.lock():
+            if not os.path.exists(self.journal_file):
+                self._new_journal()
+            data = super().load()
+            self._remember_position()
+            return data
+    
+    def save(self, data):
+        with self.lock():
+            self._write_data_file(dict(data, journal_seq=self.seq))
+            self._new_journal()
+            self.journal_records = 0
+    
+    def append_many(self, data, records):
+        with self.lock():
+            super().append_many(data, records)
+            self._remember_position()
+    
+    def changes(self):
+        with self._thread_lock:
+            try:
+                stat = os.stat(self.journal_file)
+            except FileNotFoundError:
+                return []
+            if self._stat_key(stat) == self.journal_stat:
+                return []
+            
+            records = []
+            with open(self.journal_file, 'rb') as f:
+                generation, snapshot_seq = self._read_marker(f)
+                if generation != self.journal_generation:
+                    # Another process compacted. Finish the journal we were
+                    # reading, then start the new one from the top.
+                    if snapshot_seq > self.seq:
+                        records = self._read_previous_journal()
+                    if snapshot_seq > self.seq:
+                        return [('reload', None)]
+                    self.journal_generation = generation
+                    self.journal_offset = 0
+                    self.journal_records = 0
+                f.seek(self.journal_offset)
+                records.extend(self._read_records(f))
+                self.journal_stat = self._stat_key(os.fstat(f.fileno()))
+            return records
+    
+    def _read_records(self, f):
+        """Parse complete journal lines from the current offset onwards"""
+        records = []
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                # Still being written; pick it up next time
+                break
+            self.journal_offset += len(raw)
+            record = self._parse_line(raw)
+            if record is None:
+                print(f"⚠ Skipping unreadable journal line at byte {self.journal_offset - len(raw)}")
+                continue
+            if 'op' not in record or record['seq'] <= self.seq:
+                continue
+            records.append((record['op'], record['data']))
+            self.seq = record['seq']
+            self.journal_records += 1
+        return records
+    
+    def _read_previous_journal(self):
+        """Unread records from the journal generation before the last compaction"""
+        try:
+            with open(self.previous_journal_file, 'rb') as f:
+                if self._read_marker(f)[0] != self.journal_generation:
+                    return []
+                f.seek(self.journal_offset)
+                return self._read_records(f)
+        except FileNotFoundError:
+            return []
+    
+    def _new_journal(self):
+        """Start a new journal generation holding only a compaction marker.
+        
+        The old journal stays readable as `<journal>.prev` so processes that
+        had not caught up yet can read their missing tail from it.
+        """
+        marker = json.dumps({'snapshot_seq': self.seq, 'generation': os.urandom(8).hex()}) + '\n'
+        directory = os.path.dirname(os.path.abspath(self.journal_file))
+        if os.path.exists(self.journal_file):
+            link_path = self.previous_journal_file + '.tmp'
+            if os.path.exists(link_path):
+                os.remove(link_path)
+            os.link(self.journal_file, link_path)
+            os.replace(link_path, self.previous_journal_file)
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(self.journal_file),
+                                        suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(marker)
+        os.chmod(tmp_path, _file_mode(self.journal_file))
+        os.replace(tmp_path, self.journal_file)
+        self._remember_position()
+    
+    def _remember_position(self):
+        """Mark the whole journal as read; only call while holding the lock"""
+        with open(self.journal_file, 'rb') as f:
+            self.journal_generation = self._read_marker(f)[0]
+            stat = os.fstat(f.fileno())
+        self.journal_offset = stat.st_size
+        self.journal_stat = self._stat_key(stat)
+    
+    @staticmethod
+    def _read_marker(f):
+        """(generation, snapshot_seq) from the compaction marker on the first line"""
+        first = f.readline()
+        if first.endswith(b'\n') and first.startswith(b'{"snapshot_seq"'):
+            marker = json.loads(first)
+            return marker.get('generation'), marker['snapshot_seq']
+        return None, 0
+    
+    @staticmethod
+    def _stat_key(stat):
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def frozen_copy(data):
+    """Copy of a dataset's collections that later appends to `data` leave alone.
+    
+    Rows are shared, not copied; they are never changed once appended.
+    """
+    interpretations = data['interpretations']
+    frozen = dict(data, symbols=list(data['symbols']), dreams=list(data['dreams']),
+                  interpretations=(interpretations.copy() if isinstance(interpretations, InterpretationTable)
+                                   else list(interpretations)))
+    if 'next_ids' in data:
+        frozen['next_ids'] = dict(data['next_ids'])
+    return frozen
+
+
+class WriteBehindStore(DreamStore):
+    """Hands writes to a background thread that batches them.
+    
+    append() and save() only put a request on a bounded queue, so callers
+    never wait on the disk unless the queue is full. The writer thread
+    collects requests for up to `flush_interval` seconds or `flush_records`
+    records and persists each batch with one call to the wrapped store.
+    
+    By the time the writer runs, the live data already holds records still
+    in the queue, so a snapshot written from it would contain records whose
+    journal lines come later and are replayed again on the next load.
+    Saves and compactions therefore write a frozen_copy() taken when they
+    are queued. lock() makes applying a record and queuing it one step, so
+    the copy holds exactly the records queued before it.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, store, flush_interval=1.0, flush_records=100, max_queue=10000):
+        self.store = store
+        self.indexed = store.indexed
+        # Compaction is queued from here, with a frozen copy, instead of
+        # being left to the wrapped store
+        self.compact_every = getattr(store, 'compact_every', 0)
+        if self.compact_every:
+            store.compact_every = 0
+        self.records_since_compaction = 0
+        self._lock = threading.RLock()
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.flushes = 0
+        self.records_flushed = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='dreamvista-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    @property
+    def bytes_written(self):
+        return self.store.bytes_written
+    
+    def exists(self):
+        return self.store.exists()
+    
+    def load(self):
+        return self.store.load()
+    
+    def lock(self):
+        """Held by callers from applying a record to the data until it is queued"""
+        return self._lock
+    
+    def save(self, data):
+        with self._lock:
+            self.queue.put(('save', frozen_copy(data), None))
+            self.records_since_compaction = 0
+    
+    def append(self, data, op, payload):
+        self.append_many(data, [(op, payload)])
+    
+    def append_many(self, data, records):
+        with self._lock:
+            for op, payload in records:
+                self.queue.put((op, data, payload))
+            self.records_since_compaction += len(records)
+            if self.compact_every and self.records_since_compaction >= self.compact_every:
+                self.save(data)
+    
+    def flush(self):
+        if self._closed:
+            # close() already wrote everything and the writer thread is gone
+            return
+        done = threading.Event()
+        self.queue.put(('flush', None, done))
+        done.wait()
+    
+    def close(self):
+        """Drain the queue, stop the writer thread and close the wrapped store"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self.queue.put((self._STOP, None, None))
+        self._thread.join()
+        self.store.close()
+    
+    def stats(self):
+        """Queue depth, flush latency and bytes written, for tuning the interval"""
+        return {
+            'queue_depth': self.queue.qsize(),
+            'flushes': self.flushes,
+            'records_flushed': self.records_flushed,
+            'errors': self.errors,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'avg_flush_ms': self.total_flush_ms / self.flushes if self.flushes else 0.0,
+            'bytes_written': self.bytes_written
+        }
+    
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            batch = []
+            waiters = []
+            data = None
+            snapshot = None
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                op, item_data, payload = item
+                if op is self._STOP:
+                    stop = True
+                elif op == 'flush':
+                    waiters.append(payload)
+                elif op == 'save':
+                    # Records queued after the save must be written after it
+                    snapshot = item_data
+                else:
+                    data = item_data
+                    batch.append((op, payload))
+                if stop or waiters or snapshot is not None or len(batch) >= self.flush_records:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            self._write(data, batch, snapshot)
+            for waiter in waiters:
+                waiter.set()
+    
+    def _write(self, data, batch, snapshot):
+        if not batch and snapshot is None:
+            return
+        start = time.perf_counter()
+        try:
+            if batch:
+                self.store.append_many(data, batch)
+            if snapshot is not None:
+                self.store.save(snapshot)
+        except Exception as e:
+            self.errors += 1
+            print(f"✗ Error saving data: {e}")
+        elapsed = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.records_flushed += len(batch)
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self.total_flush_ms += elapsed
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    meaning TEXT,
+    emotional_tone TEXT,
+    category TEXT,
+    keywords TEXT
+);
+CREATE TABLE IF NOT EXISTS dreams (
+    id INTEGER PRIMARY KEY,
+    dream_text TEXT,
+    dream_date TEXT,
+    mood_before TEXT,
+    recurring INTEGER,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS interpretations (
+    id INTEGER PRIMARY KEY,
+    dream_id INTEGER NOT NULL,
+    symbol_id INTEGER NOT NULL,
+    relevance_score INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_interpretations_symbol_id ON interpretations(symbol_id);
+CREATE INDEX IF NOT EXISTS idx_interpretations_dream_id ON interpretations(dream_id);
+CREATE INDEX IF NOT EXISTS idx_dreams_created_at ON dreams(created_at);
+CREATE TABLE IF NOT EXISTS daily_dreams (
+    day TEXT PRIMARY KEY,
+    dreams INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_symbols (
+    day TEXT NOT NULL,
+    symbol_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, symbol_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS symbol_pairs (
+    symbol_id INTEGER NOT NULL,
+    other_id INTEGER NOT NULL,
+    dreams INTEGER NOT NULL,
+    PRIMARY KEY (symbol_id, other_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS dreams_fts USING fts5(stems, content='');
+CREATE TRIGGER IF NOT EXISTS dreams_fts_insert AFTER INSERT ON dreams
+BEGIN
+    INSERT INTO dreams_fts (rowid, stems) VALUES (NEW.id, dream_stems(NEW.dream_text));
+END;
+CREATE TRIGGER IF NOT EXISTS dreams_fts_delete AFTER DELETE ON dreams
+BEGIN
+    INSERT INTO dreams_fts (dreams_fts, rowid, stems) VALUES ('delete', OLD.id, dream_stems(OLD.dream_text));
+END;
+CREATE TRIGGER IF NOT EXISTS dreams_rollup_insert AFTER INSERT ON dreams
+WHEN NEW.dream_date IS NOT NULL
+BEGIN
+    INSERT INTO daily_dreams (day, dreams) VALUES (NEW.dream_date, 1)
+    ON CONFLICT (day) DO UPDATE SET dreams = dreams + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS dreams_rollup_delete AFTER DELETE ON dreams
+BEGIN
+    UPDATE daily_dreams SET dreams = dreams - 1 WHERE day = OLD.dream_date;
+END;
+CREATE TRIGGER IF NOT EXISTS interpretations_rollup_insert AFTER INSERT ON interpretations
+BEGIN
+    INSERT INTO daily_symbols (day, symbol_id, count)
+    SELECT dream_date, NEW.symbol_id, 1 FROM dreams WHERE id = NEW.dream_id AND dream_date IS NOT NULL
+    ON CONFLICT (day, symbol_id) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS interpretations_rollup_delete AFTER DELETE ON interpretations
+BEGIN
+    UPDATE daily_symbols SET count = count - 1
+    WHERE symbol_id = OLD.symbol_id AND day = (SELECT dream_date FROM dreams WHERE id = OLD.dream_id);
+END;
+CREATE TRIGGER IF NOT EXISTS interpretations_pairs_insert AFTER INSERT ON interpretations
+BEGIN
+    INSERT INTO symbol_pairs (symbol_id, other_id, dreams) VALUES (NEW.symbol_id, NEW.symbol_id, 1)
+    ON CONFLICT (symbol_id, other_id) DO UPDATE SET dreams = dreams + 1;
+    INSERT INTO symbol_pairs (symbol_id, other_id, dreams)
+    SELECT NEW.symbol_id, symbol_id, 1 FROM interpretations
+    WHERE dream_id = NEW.dream_id AND symbol_id != NEW.symbol_id
+    ON CONFLICT (symbol_id, other_id) DO UPDATE SET dreams = dreams + 1;
+    INSERT INTO symbol_pairs (symbol_id, other_id, dreams)
+    SELECT symbol_id, NEW.symbol_id, 1 FROM interpretations
+    WHERE dream_id = NEW.dream_id AND symbol_id != NEW.symbol_id
+    ON CONFLICT (symbol_id, other_id) DO UPDATE SET dreams = dreams + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS interpretations_pairs_delete AFTER DELETE ON interpretations
+BEGIN
+    UPDATE symbol_pairs SET dreams = dreams - 1
+    WHERE (symbol_id = OLD.symbol_id AND other_id = OLD.symbol_id)
+       OR (symbol_id = OLD.symbol_id AND other_id IN (
+               SELECT symbol_id FROM interpretations WHERE dream_id = OLD.dream_id))
+       OR (other_id = OLD.symbol_id AND symbol_id IN (
+               SELECT symbol_id FROM interpretations WHERE dream_id = OLD.dream_id));
+END;
+"""
+# PRAGMA user_version of a database whose rollup and search tables are complete
+SQLITE_SCHEMA_VERSION = 3
+
+
+def dream_stems(text):
+    """What dreams_fts indexes for a dream: the stems TextIndex uses, space separated"""
+    return ' '.join(content_stems(text)) if text else ''
+
+SYMBOL_COLUMNS = ('id', 'symbol', 'meaning', 'emotional_tone', 'category', 'keywords')
+DREAM_COLUMNS = ('id', 'dream_text', 'dream_date', 'mood_before', 'recurring', 'created_at')
+INTERPRETATION_COLUMNS = ('id', 'dream_id', 'symbol_id', 'relevance_score')
+
+
+class SqliteStore(DreamStore):
+    """SQLite database with one table per collection.
+    
+    Only the symbol catalog is loaded into memory. Dreams and
+    interpretations stay on disk and statistics and search run as indexed
+    SQL queries. Triggers keep per-day rollups of dream and symbol counts
+    in daily_dreams and daily_symbols, and the number of dreams each pair
+    of symbols shares in symbol_pairs (symbol_id = other_id rows count the
+    dreams of a single symbol), as rows are inserted or replaced.
+    dreams_fts is a contentless FTS5 index of each dream's stems for
+    search_dreams; its triggers call dream_stems, which every connection
+    that writes dreams has to register.
+    """
+    
+    indexed = True
+    
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._data_version = None
+        self._max_symbol_id = 0
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # INSERT OR REPLACE only fires the delete triggers with this on
+        self.conn.execute('PRAGMA recursive_triggers=ON')
+        self.conn.create_function('dream_stems', 1, dream_stems, deterministic=True)
+        self.conn.executescript(SQLITE_SCHEMA)
+        if self._schema_version() < SQLITE_SCHEMA_VERSION:
+            # Fill the tables a database created by an older version lacks
+            with self.lock():
+                version = self._schema_version()
+                if version < 2:
+                    self.rebuild_rollups()
+                if version < 3:
+                    self.rebuild_search_index()
+                self.conn.execute(f'PRAGMA user_version = {SQLITE_SCHEMA_VERSION}')
+    
+    def _schema_version(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def exists(self):
+        with self._lock:
+            return self.conn.execute('SELECT EXISTS(SELECT 1 FROM symbols)').fetchone()[0] == 1
+    
+    def load(self):
+        with self._lock:
+            symbols = [dict(row) for row in self.conn.execute(
+                f"SELECT {', '.join(SYMBOL_COLUMNS)} FROM symbols ORDER BY id")]
+            next_ids = {}
+            for table in ('symbols', 'dreams', 'interpretations'):
+                highest = self.conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+                next_ids[table] = (highest or 0) + 1
+            self._data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+            self._max_symbol_id = next_ids['symbols'] - 1
+        return {'symbols': symbols, 'dreams': [], 'interpretations': [], 'next_ids': next_ids}
+    
+    def save(self, data):
+        with self._lock, self.conn:
+            self._insert('symbols', SYMBOL_COLUMNS, data['symbols'])
+            self._max_symbol_id = max([self._max_symbol_id] + [s['id'] for s in data['symbols']])
+            self._insert('dreams', DREAM_COLUMNS, data['dreams'])
+            self._insert('interpretations', INTERPRETATION_COLUMNS, data['interpretations'])
+    
+    def append(self, data, op, payload):
+        self.append_many(data, [(op, payload)])
+    
+    def append_many(self, data, records):
+        with self._lock, self.conn:
+            for op, payload in records:
+                if op == 'dream':
+                    self._insert('dreams', DREAM_COLUMNS, [payload])
+                elif op == 'interpretations':
+                    self._insert('interpretations', INTERPRETATION_COLUMNS, payload)
+                elif op == 'symbol':
+                    self._insert('symbols', SYMBOL_COLUMNS, [payload])
+                    self._max_symbol_id = max(self._max_symbol_id, payload['id'])
+                else:
+                    raise ValueError(f"Unknown storage operation: {op}")
+    
+    @contextlib.contextmanager
+    def lock(self):
+        """Hold an IMMEDIATE transaction so no other connection can write meanwhile"""
+        with self._lock:
+            if self._lock_depth == 0 and not self.conn.in_transaction:
+                self.conn.execute('BEGIN IMMEDIATE')
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self.conn.in_transaction:
+                    self.conn.commit()
+    
+    def local_lock(self):
+        return self._lock
+    
+    def version(self):
+        # PRAGMA data_version differs between connections; rows are never
+        # deleted, so the highest IDs identify the data
+        with self._lock:
+            return ('sqlite',) + tuple(self.conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+                                       for table in ('symbols', 'dreams', 'interpretations'))
+    
+    def changes(self):
+        """New symbols and ID high-water marks committed by other connections"""
+        with self._lock:
+            # data_version only moves when another connection commits
+            version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return []
+            self._data_version = version
+            symbols = [dict(row) for row in self.conn.execute(
+                f"SELECT {', '.join(SYMBOL_COLUMNS)} FROM symbols WHERE id > ? ORDER BY id",
+                (self._max_symbol_id,))]
+            next_ids = {}
+            for table in ('symbols', 'dreams', 'interpretations'):
+                highest = self.conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+                next_ids[table] = (highest or 0) + 1
+        if symbols:
+            self._max_symbol_id = symbols[-1]['id']
+        return [('symbol', symbol) for symbol in symbols] + [('next_ids', next_ids)]
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+    
+    def _insert(self, table, columns, rows):
+        placeholders = ', '.join('?' for _ in columns)
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            ([row.get(column) for column in columns] for row in rows))
+    
+    def row_counts(self):
+        """Number of rows in each table"""
+        with self._lock:
+            return {table: self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                    for table in ('symbols', 'dreams', 'interpretations')}
+    
+    def get_dream_statistics(self, top_k=5):
+        """Total dreams, most common symbols and tone distribution"""
+        with self._lock:
+            total_dreams = self.conn.execute('SELECT COUNT(*) FROM dreams').fetchone()[0]
+            # MIN(i.id) breaks ties by first occurrence, like Counter.most_common
+            common_symbols = [dict(row) for row in self.conn.execute(
+                """SELECT s.symbol AS symbol, COUNT(*) AS frequency
+                   FROM interpretations i JOIN symbols s ON s.id = i.symbol_id
+                   GROUP BY i.symbol_id
+                   ORDER BY frequency DESC, MIN(i.id)
+                   LIMIT ?""", (top_k,))]
+            emotional_tones = [dict(row) for row in self.conn.execute(
+                """SELECT s.emotional_tone AS emotional_tone, COUNT(*) AS count
+                   FROM interpretations i JOIN symbols s ON s.id = i.symbol_id
+                   GROUP BY s.emotional_tone
+                   ORDER BY MIN(i.id)""")]
+        return {
+            'total_dreams': total_dreams,
+            'common_symbols': common_symbols,
+            'emotional_tones': emotional_tones
+        }
+    
+    def daily_rollups(self, date_from=None, date_to=None):
+        """DailyRollups for the days from date_from to date_to (YYYY-MM-DD, inclusive)"""
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append('day >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('day <= ?')
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rollups = DailyRollups()
+        with self._lock:
+            for day, dreams in self.conn.execute(
+                    f'SELECT day, dreams FROM daily_dreams {where} ORDER BY day', params):
+                rollups.add_dream(day_ordinal(day), dreams)
+            for day, symbol_id, count in self.conn.execute(
+                    f'SELECT day, symbol_id, count FROM daily_symbols {where} ORDER BY day, symbol_id', params):
+                rollups.add_interpretation(day_ordinal(day), symbol_id, count)
+        return rollups
+    
+    def cooccurrence(self, symbol_ids=None):
+        """CoOccurrence with the pairs of symbol_ids (all pairs if None)"""
+        cooccurrence = CoOccurrence()
+        with self._lock:
+            cooccurrence.total_dreams = self.conn.execute('SELECT COUNT(*) FROM dreams').fetchone()[0]
+            if symbol_ids is None:
+                rows = self.conn.execute('SELECT symbol_id, other_id, dreams FROM symbol_pairs WHERE dreams > 0')
+            else:
+                placeholders = ', '.join('?' for _ in symbol_ids)
+                rows = self.conn.execute(
+                    f"""SELECT symbol_id, other_id, dreams FROM symbol_pairs
+                        WHERE dreams > 0 AND (symbol_id = other_id OR symbol_id IN ({placeholders}))""",
+                    list(symbol_ids))
+            for symbol_id, other_id, dreams in rows:
+                if symbol_id == other_id:
+                    cooccurrence.symbol_dreams[symbol_id] = dreams
+                else:
+                    cooccurrence.pairs.setdefault(symbol_id, Counter())[other_id] = dreams
+        return cooccurrence
+    
+    def rebuild_rollups(self):
+        """Recompute the rollup tables from the dreams and interpretations tables"""
+        with self.lock():
+            self.conn.execute('DELETE FROM daily_dreams')
+            self.conn.execute('DELETE FROM daily_symbols')
+            self.conn.execute('DELETE FROM symbol_pairs')
+            self.conn.execute(
+                """INSERT INTO daily_dreams (day, dreams)
+                   SELECT dream_date, COUNT(*) FROM dreams
+                   WHERE dream_date IS NOT NULL
+                   GROUP BY dream_date""")
+            self.conn.execute(
+                """INSERT INTO daily_symbols (day, symbol_id, count)
+                   SELECT d.dream_date, i.symbol_id, COUNT(*)
+                   FROM interpretations i JOIN dreams d ON d.id = i.dream_id
+                   WHERE d.dream_date IS NOT NULL
+                   GROUP BY d.dream_date, i.symbol_id""")
+            self.conn.execute(
+                """INSERT INTO symbol_pairs (symbol_id, other_id, dreams)
+                   SELECT symbol_id, symbol_id, COUNT(*) FROM interpretations
+                   GROUP BY symbol_id""")
+            self.conn.execute(
+                """INSERT INTO symbol_pairs (symbol_id, other_id, dreams)
+                   SELECT a.symbol_id, b.symbol_id, COUNT(*)
+                   FROM interpretations a JOIN interpretations b
+                        ON b.dream_id = a.dream_id AND b.symbol_id != a.symbol_id
+                   GROUP BY a.symbol_id, b.symbol_id""")
+            # Number of days with dreams
+            return self.conn.execute('SELECT COUNT(*) FROM daily_dreams').fetchone()[0]
+    
+    def rebuild_search_index(self):
+        """Re-index every dream in dreams_fts"""
+        with self.lock():
+            self.conn.execute("INSERT INTO dreams_fts (dreams_fts) VALUES ('delete-all')")
+            self.conn.execute('INSERT INTO dreams_fts (rowid, stems) SELECT id, dream_stems(dream_text) FROM dreams')
+    
+    def search_dreams(self, words, phrases, symbol_ids, offset=0, limit=None):
+        """Dreams with every word and phrase, best FTS5 BM25 score first, each with a 'score'"""
+        conditions = ['id IN (SELECT dream_id FROM interpretations WHERE symbol_id = ?)' for _ in symbol_ids]
+        params = list(symbol_ids)
+        columns = ', '.join(f'd.{column}' for column in DREAM_COLUMNS)
+        terms = [' '.join(content_stems(text)) for text in list(words) + list(phrases)]
+        terms = [term for term in terms if term]
+        with self._lock:
+            if not terms:
+                where = ' AND '.join(f'd.{condition}' for condition in conditions)
+                rows = self.conn.execute(
+                    f"""SELECT {columns}, 0.0 AS score FROM dreams d WHERE {where}
+                        ORDER BY d.created_at DESC, d.id LIMIT ? OFFSET ?""",
+                    params + [-1 if limit is None else limit, offset]).fetchall()
+            else:
+                # Each word or phrase is one quoted FTS5 phrase; all are required
+                match = ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+                where = ''.join(f' AND d.{condition}' for condition in conditions)
+                rows = self.conn.execute(
+                    f"""SELECT {columns}, -bm25(dreams_fts) AS score
+                        FROM dreams_fts JOIN dreams d ON d.id = dreams_fts.rowid
+                        WHERE dreams_fts MATCH ?{where}
+                        ORDER BY bm25(dreams_fts), d.id DESC LIMIT ? OFFSET ?""",
+                    [match] + params + [-1 if limit is None else limit, offset]).fetchall()
+        dreams = []
+        for row in rows:
+            dream = dict(row)
+            dream['recurring'] = bool(dream['recurring'])
+            dream['score'] = round(dream['score'], 3)
+            dreams.append(dream)
+        return dreams
+    
+    def search_dreams_by_symbol(self, symbol_id, offset=0, limit=None):
+        """Dreams interpreted with a symbol, newest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"""SELECT {', '.join(DREAM_COLUMNS)} FROM dreams
+                    WHERE id IN (SELECT dream_id FROM interpretations WHERE symbol_id = ?)
+                    ORDER BY created_at DESC, id
+                    LIMIT ? OFFSET ?""",
+                (symbol_id, -1 if limit is None else limit, offset)).fetchall()
+        dreams = []
+        for row in rows:
+            dream = dict(row)
+            dream['recurring'] = bool(dream['recurring'])
+            dreams.append(dream)
+        return dreams
+
+
+def migrate_json_to_sqlite(json_file, db_file):
+    """Copy a JSON (and journal) dataset into an SQLite database"""
+    data = JournalStore(json_file).load()
+    store = SqliteStore(db_file)
+    try:
+        store.save(data)
+    finally:
+        store.close()
+    return {collection: len(data[collection]) for collection in ('symbols', 'dreams', 'interpretations')}
@@ -0,0 +1,181 @@
+"""Typo-tolerant lookup of symbols by name or keyword"""
+import heapq
+from array import array
+from collections import Counter
+from itertools import chain
+
+from symbol_matcher import symbol_patterns, tokenize
+
+# Typos can leave a query this short with no trigram in common with the
+# term it was meant to be ("cta" and "cat"); such queries fall back to
+# comparing every term of about the same length when no candidate matches
+SHORT_TERM = 5
+
+
+def normalize(text):
+    """Lowercase words joined by single spaces, punctuation dropped"""
+    return ' '.join(tokenize(text))
+
+
+def trigrams(term):
+    """Distinct three-character slices of a term padded with a space each side"""
+    padded = f' {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term):
+    """Typos tolerated in a term of this length: none for 1-2 characters, up to 3"""
+    if len(term) < 3:
+        return 0
+    if len(term) <= 5:
+        return 1
+    if len(term) <= 10:
+        return 2
+    return 3
+
+
+def edit_distance(a, b, limit):
+    """Edit distance between a and b, or limit + 1 if it exceeds limit.
+    
+    Insertions, deletions, substitutions and swaps of adjacent characters
+    ("fyling") count one edit each (optimal string alignment). Uses Myers'
+    bit-parallel algorithm with Hyyro's transposition step: one column of
+    the distance matrix is kept as bit vectors of +1/-1 vertical steps, so
+    each character of b costs a few integer operations.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a:
+        return len(b)
+    # bit i of masks[c] is set where a[i] == c
+    masks = {}
+    for i, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | 1 << i
+    positive = -1
+    negative = 0
+    last = 1 << (len(a) - 1)
+    distance = len(a)
+    previous_mask = 0
+    previous_diagonal = 0
+    for char in b:
+        mask = masks.get(char, 0)
+        transposed = ((~previous_diagonal & mask) << 1) & previous_mask
+        vertical = mask | negative | transposed
+        horizontal = (((mask & positive) + positive) ^ positive) | mask | transposed
+        horizontal_positive = negative | ~(horizontal | positive)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        previous_diagonal = horizontal | vertical
+        previous_mask = mask
+        horizontal_positive = horizontal_positive << 1 | 1
+        horizontal_negative <<= 1
+        positive = horizontal_negative | ~(vertical | horizontal_positive)
+        negative = horizontal_positive & vertical
+    return distance if distance <= limit else limit + 1
+
+
+class SymbolNameIndex:
+    """Trigram index over the normalized names and keywords of symbols.
+    
+    Exact lookups are a dict access. Fuzzy lookups count the trigrams a
+    query shares with every indexed term from the trigram postings, keep
+    the terms that share enough of them to be within the allowed number
+    of edits (one edit removes at most four of a term's trigrams), and
+    compute the edit distance for those only. Terms must share at least
+    one trigram to be considered, except for short queries (SHORT_TERM).
+    """
+    
+    def __init__(self, symbols=()):
+        self.terms = []
+        # term -> term number
+        self.term_numbers = {}
+        # term number -> [(symbol, is_name)]
+        self.term_symbols = []
+        # term number -> number of distinct trigrams
+        self.trigram_counts = array('H')
+        # trigram -> term numbers
+        self.postings = {}
+        # length -> term numbers of terms up to SHORT_TERM + 1 characters long
+        self.short_terms = {}
+        for symbol in symbols:
+            self.add_symbol(symbol)
+    
+    def __len__(self):
+        return len(self.terms)
+    
+    def add_symbol(self, symbol):
+        """Index a newly added symbol's name and keywords"""
+        postings = self.postings
+        for position, (pattern, _) in enumerate(symbol_patterns(symbol)):
+            term = normalize(pattern)
+            if not term:
+                continue
+            number = self.term_numbers.get(term)
+            if number is None:
+                number = self.term_numbers[term] = len(self.terms)
+                self.terms.append(term)
+                self.term_symbols.append([(symbol, position == 0)])
+                term_trigrams = trigrams(term)
+                self.trigram_counts.append(min(len(term_trigrams), 0xFFFF))
+                for trigram in term_trigrams:
+                    entry = postings.get(trigram)
+                    if entry is None:
+                        entry = postings[trigram] = array('I')
+                    entry.append(number)
+                if len(term) <= SHORT_TERM + 1:
+                    self.short_terms.setdefault(len(term), array('I')).append(number)
+            elif not any(other is symbol for other, _ in self.term_symbols[number]):
+                # A keyword that repeats another symbol's, or the name
+                self.term_symbols[number].append((symbol, position == 0))
+    
+    def lookup(self, text):
+        """Symbols whose name or a keyword equals the text, names first"""
+        number = self.term_numbers.get(normalize(text))
+        if number is None:
+            return []
+        return [symbol for symbol, _ in sorted(self.term_symbols[number], key=lambda entry: not entry[1])]
+    
+    def similar(self, text, limit=5, max_distance=None):
+        """Return up to `limit` (symbol, distance, term) closest to the text, best first.
+        
+        Each symbol appears once, with its closest name or keyword; at
+        equal distance a name beats a keyword. max_distance defaults to
+        max_edits() of the text.
+        """
+        query = normalize(text)
+        if not query:
+            return []
+        if max_distance is None:
+            max_distance = max_edits(query)
+        query_trigrams = trigrams(query)
+        shared = Counter(chain.from_iterable(self.postings.get(trigram, ()) for trigram in query_trigrams))
+        
+        best = {}
+        slack = 4 * max_distance
+        needed = len(query_trigrams) - slack
+        trigram_counts = self.trigram_counts
+        candidates = [number for number, count in shared.items()
+                      if count >= needed and count >= trigram_counts[number] - slack]
+        self._add_closest(best, query, candidates, max_distance)
+        if not best and len(query) <= SHORT_TERM:
+            candidates = chain.from_iterable(self.short_terms.get(length, ())
+                                             for length in range(len(query) - max_distance,
+                                                                 len(query) + max_distance + 1))
+            self._add_closest(best, query, candidates, max_distance)
+        closest = heapq.nsmallest(limit, best.values(), key=lambda item: (item[0], item[1]['id']))
+        return [(symbol, rank[0], term) for rank, symbol, term in closest]
+    
+    def _add_closest(self, best, query, numbers, max_distance):
+        """Record in `best` each symbol's closest term among `numbers` within max_distance"""
+        for number in numbers:
+            term = self.terms[number]
+            distance = edit_distance(query, term, max_distance)
+            if distance > max_distance:
+                continue
+            for symbol, is_name in self.term_symbols[number]:
+                rank = (distance, not is_name)
+                if symbol['id'] not in best or rank < best[symbol['id']][0]:
+                    best[symbol['id']] = (rank, symbol, term)
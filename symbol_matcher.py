@@ -0,0 +1,154 @@
+"""Word-level matching of dream symbols against dream text"""
+import re
+from functools import lru_cache
+
+NAME_RELEVANCE = 10
+KEYWORD_RELEVANCE = 7
+
+TOKEN_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+VOWELS = set('aeiouy')
+
+# Skipped in both the text and the phrases, so "teeth were falling out"
+# matches "teeth falling out" and "exam or test" needs only exam and test
+STOP_WORDS = frozenset('''
+    a an the and or but of in on at to for with from by into onto as
+    i me my we our you your he him his she her they them their it its
+    is am are was were be been being do did does have has had this that
+'''.split())
+
+# Forms the suffix rules below cannot reach
+IRREGULAR = {
+    'flew': 'fly', 'flown': 'fly', 'fell': 'fall', 'fallen': 'fall',
+    'teeth': 'tooth', 'feet': 'foot', 'mice': 'mouse', 'geese': 'goose',
+    'children': 'child', 'men': 'man', 'women': 'woman', 'people': 'person',
+    'ran': 'run', 'swam': 'swim', 'swum': 'swim', 'drove': 'drive', 'driven': 'drive',
+    'rode': 'ride', 'ridden': 'ride', 'died': 'die', 'dying': 'die', 'lying': 'lie',
+    'lost': 'lose', 'bit': 'bite', 'bitten': 'bite', 'caught': 'catch', 'ate': 'eat',
+    'eaten': 'eat', 'froze': 'freeze', 'frozen': 'freeze', 'hid': 'hide', 'hidden': 'hide',
+    'chose': 'choose', 'chosen': 'choose', 'broke': 'break', 'broken': 'break',
+    'wolves': 'wolf', 'knives': 'knife', 'leaves': 'leaf', 'lives': 'life',
+}
+
+
+def _has_vowel(word):
+    return any(char in VOWELS for char in word)
+
+
+def _ends_cvc(word):
+    """Consonant-vowel-consonant ending, as in 'driv' or 'chas'"""
+    return (len(word) >= 3 and word[-1] not in VOWELS and word[-1] not in 'wx'
+            and word[-2] in VOWELS and word[-3] not in VOWELS)
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Light suffix stripping so inflected forms share a stem.
+    
+    Handles plurals and -ed/-ing in the spirit of Porter's first step:
+    flying/flies -> fly, chased/chasing -> chase, running -> run, plus a
+    table of irregular forms (flew, teeth, fell, ...).
+    """
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if len(word) <= 3:
+        return word
+    if word.endswith("'s"):
+        word = word[:-2]
+    
+    if word.endswith('ies') or word.endswith('ied'):
+        return word[:-3] + ('ie' if len(word) <= 4 else 'y')
+    if word.endswith('sses') or word.endswith(('ches', 'shes', 'xes', 'zzes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and not word.endswith('eed'):
+            base = word[:-len(suffix)]
+            if len(base) < 2 or not _has_vowel(base):
+                # wing, thing, bed, red
+                return word
+            if len(base) >= 2 and base[-1] == base[-2] and base[-1] not in VOWELS and base[-1] not in 'lsz':
+                return base[:-1]
+            if base.endswith('u') or _ends_cvc(base):
+                return base + 'e'
+            return base
+    return word
+
+
+def tokenize(text):
+    """Lowercased words of a text, apostrophes kept inside words"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def phrase_stems(text):
+    """Stems of the content words of a text; all stems if it has only stop words"""
+    words = tokenize(text)
+    content = tuple(stem(word) for word in words if word not in STOP_WORDS)
+    return content or tuple(stem(word) for word in words)
+
+
+def symbol_patterns(symbol):
+    """Return (pattern, relevance) pairs for a symbol's name and keywords"""
+    patterns = [(symbol['symbol'].lower(), NAME_RELEVANCE)]
+    if symbol['keywords']:
+        for keyword in symbol['keywords'].split(','):
+            patterns.append((keyword.strip().lower(), KEYWORD_RELEVANCE))
+    return patterns
+
+
+class SymbolMatcher:
+    """Phrase index over the stemmed words of symbol names and keywords.
+    
+    A symbol matches when one of its names or keywords appears in the
+    dream as a whole-word sequence after stemming and stop-word removal,
+    so "car" no longer matches "scar" and "flew" matches "flying". The
+    text is tokenized once; each word is looked up in an index keyed by
+    the first stem of every phrase.
+    """
+    
+    def __init__(self, symbols=()):
+        self.symbols = []
+        # first stem -> [(stems, position, relevance)]
+        self._phrases = {}
+        # Phrases made only of stop words are matched against every word
+        self._stop_phrases = {}
+        for symbol in symbols:
+            self.add_symbol(symbol)
+    
+    def __len__(self):
+        return len(self.symbols)
+    
+    def add_symbol(self, symbol):
+        """Register a newly added symbol"""
+        position = len(self.symbols)
+        self.symbols.append(symbol)
+        for pattern, relevance in symbol_patterns(symbol):
+            words = tokenize(pattern)
+            if not words:
+                # Empty keyword, e.g. from a trailing comma
+                continue
+            stems = phrase_stems(pattern)
+            index = self._phrases if any(word not in STOP_WORDS for word in words) else self._stop_phrases
+            index.setdefault(stems[0], []).append((stems, position, relevance))
+    
+    def match(self, dream_text):
+        """Return (symbol, relevance) pairs found in the text, in catalog order"""
+        return [(self.symbols[position], relevance) for position, relevance in self.match_positions(dream_text)]
+    
+    def match_positions(self, dream_text):
+        """Like match(), but with positions in self.symbols instead of the symbols"""
+        words = tokenize(dream_text)
+        all_stems = [stem(word) for word in words]
+        hits = {}
+        self._scan([s for s, word in zip(all_stems, words) if word not in STOP_WORDS], self._phrases, hits)
+        if self._stop_phrases:
+            self._scan(all_stems, self._stop_phrases, hits)
+        return sorted(hits.items())
+    
+    @staticmethod
+    def _scan(stems, index, hits):
+        for start, first in enumerate(stems):
+            for phrase, position, relevance in index.get(first, ()):
+                if hits.get(position, 0) < relevance and tuple(stems[start:start + len(phrase)]) == phrase:
+                    hits[position] = relevance
@@ -0,0 +1,164 @@
+"""Inverted word index over dream texts with BM25 ranking"""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import compress
+from operator import add
+
+from symbol_matcher import STOP_WORDS, stem, tokenize
+
+# Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# symbol:NAME or symbol:"NAME", "a phrase", or a single word
+QUERY_RE = re.compile(r'(symbol:)?(?:"([^"]*)"?|(\S+))', re.IGNORECASE)
+
+
+def content_stems(text):
+    """Stems of the words of a text that are not stop words"""
+    return [stem(word) for word in tokenize(text) if word not in STOP_WORDS]
+
+
+def parse_query(query):
+    """Split a search query into (words, phrases, symbol names).
+    
+    Quoted text is a phrase, symbol:NAME or symbol:"NAME WITH SPACES" a
+    symbol filter, and anything else a word. Stop words are dropped.
+    """
+    words = []
+    phrases = []
+    symbols = []
+    for prefix, quoted, bare in QUERY_RE.findall(query):
+        text = quoted if quoted else bare
+        if prefix:
+            if text.strip():
+                symbols.append(text.strip())
+            continue
+        content = [word for word in tokenize(text) if word not in STOP_WORDS]
+        if len(content) > 1:
+            # A quoted phrase, or a hyphenated word such as rock-climbing
+            phrases.append(' '.join(content))
+        words.extend(content)
+    return words, phrases, symbols
+
+
+class TextIndex:
+    """Word -> dreams postings for ranked full-text search.
+    
+    Words are indexed by the stems symbol matching uses, so "flew" finds
+    "flying", and stop words are skipped. Each dream gets a document
+    number in the order it was added; postings are sorted arrays of
+    document numbers with a parallel array of term frequencies. Positions
+    are not stored: phrases are checked against the text of the
+    best-scoring candidates only.
+    """
+    
+    def __init__(self):
+        self.doc_ids = array('q')
+        self.doc_lengths = array('I')
+        self.total_length = 0
+        # stem -> (document numbers, term frequencies)
+        self.postings = {}
+    
+    def __len__(self):
+        return len(self.doc_ids)
+    
+    def add(self, dream_id, text):
+        """Index one dream; dreams must be added once each"""
+        # Count words before stemming; a dream repeats many of its words
+        term_counts = Counter()
+        for word, count in Counter(tokenize(str(text)) if text is not None else ()).items():
+            if word not in STOP_WORDS:
+                term_counts[stem(word)] += count
+        length = sum(term_counts.values())
+        doc = len(self.doc_ids)
+        self.doc_ids.append(dream_id)
+        self.doc_lengths.append(length)
+        self.total_length += length
+        postings = self.postings
+        for term, tf in term_counts.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array('I'), array('H'))
+            entry[0].append(doc)
+            entry[1].append(tf if tf < 0xFFFF else 0xFFFF)
+    
+    def idf(self, term):
+        df = len(self.postings[term][0])
+        return math.log(1 + (len(self.doc_ids) - df + 0.5) / (df + 0.5))
+    
+    def search(self, words, phrases=(), allowed=None, text_of=None, offset=0, limit=None):
+        """Return [(score, dream_id)] for dreams containing every word, best first.
+        
+        `allowed` restricts the result to a set of dream IDs. Dreams must
+        also contain each phrase as consecutive non-stop words;
+        text_of(dream_id) supplies the text to check them against. Ties
+        go to the most recently added dream.
+        """
+        terms = sorted({stem(word) for word in words}, key=lambda term: len(self.postings.get(term, ((),))[0]))
+        if not terms or any(term not in self.postings for term in terms):
+            return []
+        
+        average_length = self.total_length / len(self.doc_ids) or 1
+        length_of = self.doc_lengths.__getitem__
+        doc_ids = self.doc_ids
+        
+        def weights(term, docs, tfs):
+            # BM25 contribution of `term` to each of `docs`, as a lazy iterator
+            idf = self.idf(term) * (K1 + 1)
+            base = K1 * (1 - B)
+            per_word = K1 * B / average_length
+            return map(lambda tf, length: idf * tf / (tf + base + per_word * length), tfs, map(length_of, docs))
+        
+        # Start from the rarest term and look the others up by bisection
+        docs, tfs = self.postings[terms[0]]
+        if allowed is not None:
+            kept = [doc_ids[doc] in allowed for doc in docs]
+            docs, tfs = list(compress(docs, kept)), list(compress(tfs, kept))
+        scores = dict(zip(docs, weights(terms[0], docs, tfs)))
+        for term in terms[1:]:
+            if not scores:
+                return []
+            term_docs, term_tfs = self.postings[term]
+            docs = []
+            tfs = []
+            totals = []
+            for doc, total in scores.items():
+                position = bisect_left(term_docs, doc)
+                if position < len(term_docs) and term_docs[position] == doc:
+                    docs.append(doc)
+                    tfs.append(term_tfs[position])
+                    totals.append(total)
+            scores = dict(zip(docs, map(add, totals, weights(term, docs, tfs))))
+        
+        # Best first; iterating newest first makes ties go to the newest dream
+        phrase_stems = [tuple(content_stems(phrase)) for phrase in phrases]
+        if limit is not None and not phrase_stems:
+            best = heapq.nlargest(offset + limit, reversed(scores), key=scores.get)
+        else:
+            best = sorted(reversed(scores), key=scores.get, reverse=True)
+        if not phrase_stems:
+            return [(scores[doc], doc_ids[doc]) for doc in best[offset:]]
+        
+        # Check phrases best-first and stop once the page is full
+        results = []
+        for doc in best:
+            stems = content_stems(str(text_of(doc_ids[doc])))
+            if all(contains(stems, phrase) for phrase in phrase_stems):
+                results.append((scores[doc], doc_ids[doc]))
+                if limit is not None and len(results) >= offset + limit:
+                    break
+        return results[offset:]
+
+
+def contains(stems, phrase):
+    """Whether `phrase` occurs in `stems` as a consecutive run"""
+    first = phrase[0]
+    for start, value in enumerate(stems):
+        if value == first and tuple(stems[start:start + len(phrase)]) == phrase:
+            return True
+    return False